@@ -4,7 +4,7 @@ from flask import Flask
 app = Flask(__name__)
 
 # ✅ Import dei moduli interni aggiornati
-from api.database import connect_db, create_tables
+from api.database import create_tables
 from api.scraper_html_api import scrape_amazon_products
 from api.scraper_api import get_special_offers, get_affiliate_link
 from api.utils import get_affiliate_link  # ✅ Importato utils correttamente
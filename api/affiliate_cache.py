@@ -0,0 +1,123 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from db_pool import get_connection
+
+# ✅ Configurazione logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# 📌 Configurazione cache dei link affiliati
+AFFILIATE_CACHE_SIZE = int(os.getenv("AFFILIATE_CACHE_SIZE", 10000))
+AFFILIATE_CACHE_TTL_DAYS = float(os.getenv("AFFILIATE_CACHE_TTL_DAYS", 30))
+AFFILIATE_NEGATIVE_TTL_HOURS = float(os.getenv("AFFILIATE_NEGATIVE_TTL_HOURS", 24))
+
+
+class AffiliateLinkCache:
+    """
+    🗄️ Cache a due livelli dei link affiliati: LRU in memoria + tabella `affiliate_links`.
+    Un valore None è un risultato negativo (ASIN senza link) e ha una TTL più breve.
+    """
+
+    def __init__(self, size=AFFILIATE_CACHE_SIZE, ttl_days=AFFILIATE_CACHE_TTL_DAYS,
+                 negative_ttl_hours=AFFILIATE_NEGATIVE_TTL_HOURS):
+        self.size = size
+        self.ttl = ttl_days * 86400
+        self.negative_ttl = negative_ttl_hours * 3600
+        self._lru = OrderedDict()  # asin -> (link, scadenza)
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "db_hits": 0, "negative_hits": 0, "misses": 0}
+
+    def _expiry(self, link, fetched_at):
+        return fetched_at + (self.ttl if link else self.negative_ttl)
+
+    def _remember(self, asin, link, expires_at):
+        self._lru[asin] = (link, expires_at)
+        self._lru.move_to_end(asin)
+        while len(self._lru) > self.size:
+            self._lru.popitem(last=False)
+
+    def get_many(self, asins):
+        """🔍 Ritorna ({asin: link} trovati in cache, [asin mancanti o scaduti])."""
+        now = time.time()
+        found, missing = {}, []
+        with self._lock:
+            for asin in dict.fromkeys(asins):
+                entry = self._lru.get(asin)
+                if entry and entry[1] > now:
+                    self._lru.move_to_end(asin)
+                    found[asin] = entry[0]
+                    self.stats["memory_hits"] += 1
+                    self.stats["negative_hits"] += 0 if entry[0] else 1
+                else:
+                    missing.append(asin)
+
+        if missing:
+            for asin, (link, fetched_at) in self._load(missing).items():
+                expires_at = self._expiry(link, fetched_at)
+                if expires_at <= now:
+                    continue
+                found[asin] = link
+                with self._lock:
+                    self._remember(asin, link, expires_at)
+                    self.stats["db_hits"] += 1
+                    self.stats["negative_hits"] += 0 if link else 1
+            missing = [asin for asin in missing if asin not in found]
+
+        with self._lock:
+            self.stats["misses"] += len(missing)
+        return found, missing
+
+    def put_many(self, links):
+        """💾 Salva i risultati di PA-API in memoria e nel database (anche quelli negativi)."""
+        if not links:
+            return
+        now = time.time()
+        with self._lock:
+            for asin, link in links.items():
+                self._remember(asin, link, self._expiry(link, now))
+        self._store(links)
+
+    def _load(self, asins):
+        with get_connection() as conn:
+            if not conn:
+                return {}
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("""
+                        SELECT asin, affiliate_link, EXTRACT(EPOCH FROM fetched_at)
+                        FROM affiliate_links WHERE asin = ANY(%s);
+                    """, (list(asins),))
+                    return {asin: (link, float(fetched_at)) for asin, link, fetched_at in cur.fetchall()}
+            except Exception as e:
+                logger.error(f"❌ Errore nella lettura della cache dei link affiliati: {e}")
+                return {}
+
+    def _store(self, links):
+        with get_connection() as conn:
+            if not conn:
+                return
+            try:
+                with conn.cursor() as cur:
+                    cur.executemany("""
+                        INSERT INTO affiliate_links (asin, affiliate_link, fetched_at)
+                        VALUES (%s, %s, NOW())
+                        ON CONFLICT (asin) DO UPDATE
+                        SET affiliate_link = EXCLUDED.affiliate_link, fetched_at = EXCLUDED.fetched_at;
+                    """, list(links.items()))
+                conn.commit()
+            except Exception as e:
+                logger.error(f"❌ Errore nel salvataggio della cache dei link affiliati: {e}")
+
+    def hit_ratio(self):
+        with self._lock:
+            hits = self.stats["memory_hits"] + self.stats["db_hits"]
+            total = hits + self.stats["misses"]
+            return hits / total if total else 0.0
+
+    def log_stats(self):
+        with self._lock:
+            stats = dict(self.stats)
+        logger.info(f"📊 Cache link affiliati: {stats} (hit ratio {self.hit_ratio():.0%})")
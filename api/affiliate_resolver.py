@@ -0,0 +1,108 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+# ✅ Configurazione logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# 📌 PA-API accetta al massimo 10 ItemIds per richiesta GetItems
+PAAPI_BATCH_SIZE = 10
+
+# 📌 Attesa massima (secondi) dei link richiesti: un batch bloccato o un worker morto non fermano i chiamanti
+AFFILIATE_RESOLVE_TIMEOUT = float(os.getenv("AFFILIATE_RESOLVE_TIMEOUT", 60))
+
+
+class AffiliateLinkResolver:
+    """
+    📦 Raggruppa le richieste di link affiliati provenienti da più chiamanti
+    in richieste GetItems da 10 ASIN e ridistribuisce i risultati.
+
+    `fetch_batch(asins)` deve restituire un dizionario {asin: link}.
+    """
+
+    def __init__(self, fetch_batch, batch_size=PAAPI_BATCH_SIZE, max_wait=0.2):
+        self.fetch_batch = fetch_batch
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self._pending = {}  # asin -> Future condiviso da tutti i chiamanti
+        self._oldest = None
+        self._cond = threading.Condition()
+        self._worker = None
+        self.requests_sent = 0
+        self.asins_resolved = 0
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="affiliate-resolver", daemon=True)
+            self._worker.start()
+
+    def submit(self, asin):
+        """📥 Accoda un ASIN e restituisce un Future con il link."""
+        with self._cond:
+            future = self._pending.get(asin)
+            if future is None:
+                future = Future()
+                self._pending[asin] = future
+                if self._oldest is None:
+                    self._oldest = time.monotonic()
+                self._ensure_worker()
+                self._cond.notify()
+            return future
+
+    def resolve(self, asin, timeout=AFFILIATE_RESOLVE_TIMEOUT):
+        """
+        🔗 Link affiliato di un singolo ASIN (inviato insieme agli altri in attesa).
+        Solleva l'errore di PA-API, o TimeoutError dopo `timeout` secondi.
+        """
+        return self.submit(asin).result(timeout)
+
+    def resolve_many(self, asins, timeout=AFFILIATE_RESOLVE_TIMEOUT):
+        """
+        🔗 Link affiliati per una lista di ASIN: {asin: link}. Gli ASIN in errore vengono omessi,
+        così come quelli non risolti entro `timeout` secondi (scadenza unica per tutta la lista).
+        """
+        futures = {asin: self.submit(asin) for asin in dict.fromkeys(asins) if asin and asin != "N/A"}
+        deadline = None if timeout is None else time.monotonic() + timeout
+        links = {}
+        for asin, future in futures.items():
+            try:
+                links[asin] = future.result(None if deadline is None else max(deadline - time.monotonic(), 0))
+            except Exception:
+                if not future.done():
+                    logger.warning(f"⚠️ Link affiliato di {asin} non risolto entro {timeout}s.")
+                continue
+        return links
+
+    def _take_batch(self):
+        """Attende un batch pieno o la scadenza di max_wait, poi estrae fino a batch_size ASIN."""
+        with self._cond:
+            while True:
+                if self._pending:
+                    waited = time.monotonic() - self._oldest
+                    if len(self._pending) >= self.batch_size or waited >= self.max_wait:
+                        break
+                    self._cond.wait(self.max_wait - waited)
+                else:
+                    self._cond.wait()
+            asins = list(self._pending)[:self.batch_size]
+            batch = {asin: self._pending.pop(asin) for asin in asins}
+            self._oldest = time.monotonic() if self._pending else None
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            self.requests_sent += 1
+            try:
+                links = self.fetch_batch(list(batch)) or {}
+            except Exception as e:
+                logger.error(f"❌ Errore nel recupero dei link affiliati {list(batch)}: {e}")
+                for future in batch.values():
+                    future.set_exception(e)
+                continue
+            self.asins_resolved += len(batch)
+            for asin, future in batch.items():
+                future.set_result(links.get(asin))
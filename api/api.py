@@ -1,85 +1,168 @@
 from flask import Flask, jsonify, request
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS  
-from database import connect_db  # Importiamo la connessione al database
+from db_pool import get_connection  # ✅ Connessioni prese dal pool condiviso
+import fast_json  # ✅ JSON con orjson e compressione br/gzip delle risposte
+from response_cache import response_cache  # ✅ Cache delle risposte invalidata dalle scritture (LISTEN/NOTIFY)
+from product_queries import (  # ✅ Query condivise con il server asincrono (asgi_api.py)
+    CATEGORIES_QUERY, PAGE_DEFAULT_SIZE, PRODUCT_FIELDS, SEARCH_DEFAULT_LIMIT,
+    batch_query, page_query, parse_batch_body, parse_page_args, search_limit, search_query,
+    split_batch, split_page,
+)
+
+class FastJSONProvider(DefaultJSONProvider):
+    """⚡ jsonify serializza con fast_json (orjson se installato)"""
+
+    def dumps(self, obj, **kwargs):
+        return fast_json.dumps(obj).decode("utf-8")
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 CORS(app)  # ✅ Abilita CORS per evitare problemi tra frontend e backend
 
-def get_products(category=None):
-    """📥 Estrae tutti i prodotti dal database, filtrando per categoria se specificata"""
-    conn = connect_db()
-    if not conn:
-        return []
+@app.after_request
+def compress_response(response):
+    """🗜️ Comprime (br/gzip) le risposte JSON abbastanza grandi, se il client lo accetta"""
+    if response.mimetype != "application/json" or response.status_code != 200 or response.direct_passthrough \
+            or "Content-Encoding" in response.headers:
+        return response
+    response.vary.add("Accept-Encoding")
+    body, encoding = fast_json.compress_body(response.get_data(), request.headers.get("Accept-Encoding"))
+    if encoding:
+        response.set_data(body)
+        response.headers["Content-Encoding"] = encoding
+        etag, _ = response.get_etag()
+        if etag:
+            # Stessi dati, byte diversi: l'ETag diventa debole (If-None-Match usa il confronto debole)
+            response.set_etag(etag, weak=True)
+    return response
 
-    try:
+class DatabaseUnavailable(Exception):
+    """❌ Nessuna connessione dal pool (database irraggiungibile o pool esaurito)"""
+
+def error_response(e, context):
+    """
+    ❌ Risposta per un errore del database: 503 se non raggiungibile, 500 altrimenti.
+    Mai un 200 con lista vuota: la cache delle risposte lo servirebbe fino alla prossima scrittura.
+    """
+    print(f"❌ Errore {context}: {e}")
+    if isinstance(e, DatabaseUnavailable):
+        return jsonify({"error": "Database non disponibile"}), 503
+    return jsonify({"error": "Errore del database"}), 500
+
+def get_products_page(conditions, params, sort="asin", descending=False, after=None,
+                      limit=PAGE_DEFAULT_SIZE, fields=PRODUCT_FIELDS):
+    """
+    📄 Una pagina di prodotti con paginazione a chiave (keyset), vedi product_queries.page_query().
+    Ritorna (prodotti, cursore della pagina successiva o None); solleva DatabaseUnavailable senza connessione.
+    """
+    query, params = page_query(conditions, params, sort, descending, after, limit, fields)
+    with get_connection() as conn:
+        if not conn:
+            raise DatabaseUnavailable()
         with conn.cursor() as cur:
-            if category:
-                cur.execute("""
-                    SELECT asin, name, price, old_price, discount, description, rating, 
-                           reviews, availability, image_url, affiliate_link, category
-                    FROM product_prices
-                    WHERE category = %s;
-                """, (category,))
-            else:
-                cur.execute("""
-                    SELECT asin, name, price, old_price, discount, description, rating, 
-                           reviews, availability, image_url, affiliate_link, category
-                    FROM product_prices;
-                """)
-            prodotti = cur.fetchall()
-            return [
-                {
-                    "asin": row[0],
-                    "name": row[1],
-                    "price": row[2],
-                    "old_price": row[3],
-                    "discount": row[4],
-                    "description": row[5],
-                    "rating": row[6],
-                    "reviews": row[7],
-                    "availability": row[8],
-                    "image_url": row[9],
-                    "affiliate_link": row[10],
-                    "category": row[11]
-                } for row in prodotti
-            ]
-    except Exception as e:
-        print(f"❌ Errore nel recupero dei prodotti: {e}")
-        return []
-    finally:
-        conn.close()
+            cur.execute(query, params)
+            rows = cur.fetchall()
+    return split_page(rows, limit, fields)
 
 @app.route('/api/prodotti', methods=['GET'])
+@response_cache.cached
 def get_prodotti():
-    """📡 Restituisce tutti i prodotti o filtra per categoria e offerte"""
-    category = request.args.get('category')
-    discount_filter = request.args.get('discount', type=int)
+    """
+    📡 Prodotti filtrati, ordinati e paginati dal database.
+    Filtri: category, discount, min_price, max_price, min_rating, availability.
+    Ordinamento: sort=price | -price | discount | rating | reviews | name | scraped_at | asin.
+    Paginazione: limit (max 200) e cursor; il cursore della pagina successiva è nell'header X-Next-Cursor.
+    Proiezione: fields=asin,name,price
+    """
+    try:
+        page = parse_page_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        prodotti, next_cursor = get_products_page(**page)
+    except Exception as e:
+        return error_response(e, "nel recupero dei prodotti")
+
+    response = jsonify(prodotti)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Access-Control-Expose-Headers'] = 'X-Next-Cursor'
+    return response
+
+@app.route('/api/prodotti/batch', methods=['POST'])
+def get_prodotti_batch():
+    """
+    📡 Prodotti per lista di ASIN in una sola query: {"asins": [...], "history": true, "fields": "asin,price"}.
+    Risponde con i prodotti trovati nell'ordine richiesto; con history=true ognuno ha latest_history
+    (ultimo punto di price_history, o null).
+    """
+    try:
+        batch = parse_batch_body(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not batch["asins"]:
+        return jsonify([])
 
-    prodotti = get_products(category)
+    try:
+        with get_connection() as conn:
+            if not conn:
+                raise DatabaseUnavailable()
+            with conn.cursor() as cur:
+                cur.execute(*batch_query(**batch))
+                return jsonify(split_batch(cur.fetchall(), **batch))
+    except Exception as e:
+        return error_response(e, "nel recupero dei prodotti per ASIN")
 
-    # Se è richiesto un filtro sugli sconti
-    if discount_filter:
-        prodotti = [p for p in prodotti if p['discount'] and p['discount'] >= discount_filter]
+def search_products(text, category=None, limit=SEARCH_DEFAULT_LIMIT):
+    """
+    🔎 Ricerca full-text su nome e categoria (indice GIN), con completamento dell'ultima parola.
+    Solleva DatabaseUnavailable senza connessione, e gli errori del database.
+    """
+    search = search_query(text, category, limit)
+    if not search:
+        return []
 
-    return jsonify(prodotti)
+    with get_connection() as conn:
+        if not conn:
+            raise DatabaseUnavailable()
+        with conn.cursor() as cur:
+            cur.execute(*search)
+            columns = [desc[0] for desc in cur.description]
+            return [dict(zip(columns, row)) for row in cur.fetchall()]
+
+@app.route('/api/cerca', methods=['GET'])
+@response_cache.cached
+def cerca_prodotti():
+    """📡 Ricerca prodotti per testo: /api/cerca?q=portatile+16gb&category=laptop&limit=20"""
+    text = request.args.get('q', '')
+    category = request.args.get('category')
+    limit = search_limit(request.args)
+    try:
+        return jsonify(search_products(text, category, limit))
+    except Exception as e:
+        return error_response(e, "nella ricerca dei prodotti")
 
 @app.route('/api/categorie', methods=['GET'])
+@response_cache.cached
 def get_categorie():
     """📡 Restituisce la lista delle categorie disponibili"""
-    conn = connect_db()
-    if not conn:
-        return jsonify([])
-
     try:
-        with conn.cursor() as cur:
-            cur.execute("SELECT DISTINCT category FROM product_prices;")
-            categories = [row[0] for row in cur.fetchall() if row[0]]
-            return jsonify(categories)
+        with get_connection() as conn:
+            if not conn:
+                raise DatabaseUnavailable()
+            with conn.cursor() as cur:
+                cur.execute(CATEGORIES_QUERY)
+                categories = [row[0] for row in cur.fetchall() if row[0]]
+                return jsonify(categories)
     except Exception as e:
-        print(f"❌ Errore nel recupero delle categorie: {e}")
-        return jsonify([])
-    finally:
-        conn.close()
+        return error_response(e, "nel recupero delle categorie")
+
+@app.route('/api/cache', methods=['GET'])
+def get_cache_stats():
+    """📊 Statistiche della cache delle risposte: hit ratio, byte risparmiati, generazione dei dati"""
+    return jsonify(response_cache.report())
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file
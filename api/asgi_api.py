@@ -0,0 +1,174 @@
+"""
+⚡ Modalità di servizio asincrona (ASGI) delle API prodotti/categorie: Quart + pool asyncpg.
+
+Stesse route (compresa POST /api/prodotti/batch) e stesse risposte JSON di api.py (Flask + psycopg2),
+con le query condivise in product_queries.py. Ogni worker serve molte richieste concorrenti su un solo event loop, e una
+richiesta in attesa del database non occupa un thread.
+
+Avvio: API_MODE=async ./start.sh  (oppure: cd api && hypercorn -b 0.0.0.0:5001 asgi_api:app)
+La cache delle risposte (response_cache.py) è legata a Flask e qui non è attiva: /api/cache esiste solo in api.py.
+"""
+import asyncio
+import logging
+import os
+import asyncpg
+from quart import Quart, jsonify, request
+from quart.json.provider import DefaultJSONProvider
+from quart_cors import cors
+import fast_json  # ✅ JSON con orjson e compressione br/gzip delle risposte
+from db_pool import DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT, DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT
+from product_queries import (
+    CATEGORIES_QUERY, batch_query, page_query, parse_batch_body, parse_page_args, search_limit, search_query,
+    split_batch, split_page,
+)
+
+# ✅ Configurazione logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# 📌 Pool asyncpg (per worker); di default gli stessi limiti del pool sincrono
+ASYNC_DB_POOL_MIN = int(os.getenv("ASYNC_DB_POOL_MIN", DB_POOL_MIN))
+ASYNC_DB_POOL_MAX = int(os.getenv("ASYNC_DB_POOL_MAX", DB_POOL_MAX))
+
+class FastJSONProvider(DefaultJSONProvider):
+    """⚡ jsonify serializza con fast_json (orjson se installato), come in api.py"""
+
+    def dumps(self, obj, **kwargs):
+        return fast_json.dumps(obj).decode("utf-8")
+
+
+app = Quart(__name__)
+app.json = FastJSONProvider(app)
+app = cors(app)  # ✅ Abilita CORS come in api.py
+
+_pool = None
+_pool_lock = asyncio.Lock()
+
+
+def to_asyncpg(query):
+    """🔁 Converte i segnaposto %s di psycopg2 in $1, $2, ... di asyncpg."""
+    parts = query.split("%s")
+    return "".join(part + (f"${i}" if i < len(parts) else "") for i, part in enumerate(parts, start=1))
+
+
+async def get_pool():
+    """🔗 Pool asyncpg creato alla prima richiesta (e ricreato se il database non era raggiungibile)."""
+    global _pool
+    if _pool is None:
+        async with _pool_lock:
+            if _pool is None:
+                _pool = await asyncpg.create_pool(
+                    database=DB_NAME, user=DB_USER, password=DB_PASSWORD, host=DB_HOST,
+                    port=int(DB_PORT) if DB_PORT else None,
+                    min_size=ASYNC_DB_POOL_MIN, max_size=ASYNC_DB_POOL_MAX,
+                )
+                logger.info(f"✅ Pool asyncpg pronto ({ASYNC_DB_POOL_MIN}-{ASYNC_DB_POOL_MAX} connessioni).")
+    return _pool
+
+
+async def fetch(query, params=()):
+    """📥 Esegue una query con parametri %s e ritorna le righe (asyncpg.Record)."""
+    pool = await get_pool()
+    async with pool.acquire(timeout=DB_POOL_TIMEOUT) as conn:
+        return await conn.fetch(to_asyncpg(query), *params)
+
+
+def error_response(e, context):
+    """❌ Errore del database: 503 se non raggiungibile, 500 altrimenti (come in api.py, mai 200 con lista vuota)"""
+    logger.error(f"❌ Errore {context}: {e}")
+    if isinstance(e, (OSError, asyncio.TimeoutError, asyncpg.exceptions.PostgresConnectionError,
+                      asyncpg.exceptions.CannotConnectNowError, asyncpg.exceptions.TooManyConnectionsError)):
+        return jsonify({"error": "Database non disponibile"}), 503
+    return jsonify({"error": "Errore del database"}), 500
+
+
+@app.before_serving
+async def open_pool():
+    try:
+        await get_pool()
+    except Exception as e:
+        # Nuovo tentativo alla prima richiesta
+        logger.error(f"❌ Errore di connessione al database: {e}")
+
+
+@app.after_serving
+async def close_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+@app.after_request
+async def compress_response(response):
+    """🗜️ Comprime (br/gzip) le risposte JSON abbastanza grandi, se il client lo accetta"""
+    if response.mimetype != "application/json" or response.status_code != 200 \
+            or "Content-Encoding" in response.headers:
+        return response
+    response.vary.add("Accept-Encoding")
+    body, encoding = fast_json.compress_body(await response.get_data(), request.headers.get("Accept-Encoding"))
+    if encoding:
+        response.set_data(body)
+        response.headers["Content-Encoding"] = encoding
+    return response
+
+
+@app.route('/api/prodotti', methods=['GET'])
+async def get_prodotti():
+    """📡 Prodotti filtrati, ordinati e paginati: stessi argomenti e header X-Next-Cursor di api.py"""
+    try:
+        page = parse_page_args(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    try:
+        rows = await fetch(*page_query(**page))
+        prodotti, next_cursor = split_page(rows, page["limit"], page["fields"])
+    except Exception as e:
+        return error_response(e, "nel recupero dei prodotti")
+
+    response = jsonify(prodotti)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Access-Control-Expose-Headers'] = 'X-Next-Cursor'
+    return response
+
+
+@app.route('/api/prodotti/batch', methods=['POST'])
+async def get_prodotti_batch():
+    """📡 Prodotti per lista di ASIN in una sola query: stesso corpo e stessa risposta di api.py"""
+    try:
+        batch = parse_batch_body(await request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not batch["asins"]:
+        return jsonify([])
+    try:
+        return jsonify(split_batch(await fetch(*batch_query(**batch)), **batch))
+    except Exception as e:
+        return error_response(e, "nel recupero dei prodotti per ASIN")
+
+
+@app.route('/api/cerca', methods=['GET'])
+async def cerca_prodotti():
+    """📡 Ricerca prodotti per testo: /api/cerca?q=portatile+16gb&category=laptop&limit=20"""
+    search = search_query(request.args.get('q', ''), request.args.get('category'), search_limit(request.args))
+    if not search:
+        return jsonify([])
+    try:
+        return jsonify([dict(row) for row in await fetch(*search)])
+    except Exception as e:
+        return error_response(e, "nella ricerca dei prodotti")
+
+
+@app.route('/api/categorie', methods=['GET'])
+async def get_categorie():
+    """📡 Restituisce la lista delle categorie disponibili"""
+    try:
+        return jsonify([row[0] for row in await fetch(CATEGORIES_QUERY) if row[0]])
+    except Exception as e:
+        return error_response(e, "nel recupero delle categorie")
+
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=5001)
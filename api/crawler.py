@@ -0,0 +1,101 @@
+import logging
+import os
+import queue
+import threading
+import time
+
+# ✅ Configurazione logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# 📌 Configurazione crawler
+CRAWL_WORKERS = int(os.getenv("CRAWL_WORKERS", 4))
+CRAWL_PROGRESS_INTERVAL = float(os.getenv("CRAWL_PROGRESS_INTERVAL", 10))
+
+
+class CrawlScheduler:
+    """🕷️ Esegue in parallelo lo scraping delle categorie con un numero fisso di worker.
+
+    Ogni categoria è un'unità di lavoro: scrape_fn(category) restituisce lo stream dei prodotti,
+    e la paginazione (quante pagine, quando fermarsi) è decisa dallo stream stesso.
+    La cortesia verso Amazon è garantita dal token bucket per host in `http_fetcher`,
+    non da pause globali: aggiungere categorie non allunga il tempo in modo lineare.
+    """
+
+    def __init__(self, scrape_fn, workers=CRAWL_WORKERS):
+        self.scrape_fn = scrape_fn
+        self.workers = workers
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._done = 0
+        self._failed = 0
+        self._items = 0
+        self._started = None
+        self._finished = threading.Event()
+
+    def add_category(self, category):
+        self._queue.put(category)
+
+    def stats(self):
+        """📊 Profondità coda, categorie in corso e prodotti al secondo."""
+        with self._lock:
+            elapsed = time.monotonic() - self._started if self._started else 0.0
+            return {
+                "queue_depth": self._queue.qsize(),
+                "in_flight": self._in_flight,
+                "categories_done": self._done,
+                "categories_failed": self._failed,
+                "items": self._items,
+                "items_per_sec": round(self._items / elapsed, 3) if elapsed else 0.0,
+            }
+
+    def _worker(self):
+        while True:
+            try:
+                category = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            with self._lock:
+                self._in_flight += 1
+            try:
+                # Lo stream si consuma man mano: i prodotti sono contati appena salvati
+                for _ in self.scrape_fn(category) or ():
+                    with self._lock:
+                        self._items += 1
+                with self._lock:
+                    self._done += 1
+            except Exception as e:
+                logger.error(f"❌ Errore nello scraping di {category}: {e}")
+                with self._lock:
+                    self._failed += 1
+            finally:
+                with self._lock:
+                    self._in_flight -= 1
+                self._queue.task_done()
+
+    def _report_progress(self):
+        while not self._finished.wait(CRAWL_PROGRESS_INTERVAL):
+            s = self.stats()
+            logger.info(f"🕷️ Coda: {s['queue_depth']} | In corso: {s['in_flight']} | "
+                        f"Completate: {s['categories_done']} | {s['items_per_sec']} prodotti/s")
+
+    def run(self):
+        """🚀 Avvia i worker e attende che la coda sia vuota."""
+        self._started = time.monotonic()
+        self._finished.clear()
+        reporter = threading.Thread(target=self._report_progress, daemon=True)
+        reporter.start()
+
+        threads = [threading.Thread(target=self._worker, name=f"crawler-{i}", daemon=True)
+                   for i in range(min(self.workers, self._queue.qsize()) or 1)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self._finished.set()
+        s = self.stats()
+        logger.info(f"✅ Crawl completato: {s['categories_done']} categorie, {s['items']} prodotti, "
+                    f"{s['categories_failed']} errori, {s['items_per_sec']} prodotti/s")
+        return s
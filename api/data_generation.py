@@ -0,0 +1,24 @@
+# 📌 Canale LISTEN/NOTIFY su cui viene annunciata ogni nuova generazione dei dati
+DATA_CHANGED_CHANNEL = "data_changed"
+
+
+def create_generation_table(cur):
+    """🛠️ Contatore di generazione dei dati: aumenta a ogni scrittura che cambia le risposte dell'API."""
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS data_generation (
+            id INT PRIMARY KEY CHECK (id = 1),
+            generation BIGINT NOT NULL
+        );
+        INSERT INTO data_generation (id, generation) VALUES (1, 0) ON CONFLICT (id) DO NOTHING;
+    """)
+
+
+def bump_generation(cur):
+    """
+    🔔 Da chiamare nella transazione che scrive: incrementa la generazione e notifica i processi API.
+    NOTIFY viene consegnato solo al commit, quindi nessuna cache si invalida per una scrittura annullata.
+    """
+    cur.execute("UPDATE data_generation SET generation = generation + 1 WHERE id = 1 RETURNING generation")
+    row = cur.fetchone()
+    if row:
+        cur.execute("SELECT pg_notify(%s, %s)", (DATA_CHANGED_CHANNEL, str(row[0])))
@@ -1,200 +1,427 @@
-import psycopg2
-import os
+import csv
+import hashlib
+import io
+import json
 import logging
-from psycopg2 import sql
-from dotenv import load_dotenv
-from utils import get_affiliate_link
-
-# ✅ Carica variabili d'ambiente
-load_dotenv()
-
-# 📌 Configurazione database PostgreSQL
-DB_NAME = os.getenv("DB_NAME")
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-DB_HOST = os.getenv("DB_HOST")
-DB_PORT = os.getenv("DB_PORT")
+import os
+from datetime import timedelta
+from utils import resolve_many
+from db_pool import get_connection, iter_batches, iter_rows, DB_STREAM_ITERSIZE  # ✅ Pool di connessioni condiviso da tutti i moduli
+from known_asins import known_asins  # ✅ ASIN già salvati, in memoria
+from price_history import create_price_history, ensure_current_partition, ensure_partitions, record_observations
+from data_generation import create_generation_table, bump_generation  # ✅ Invalidazione della cache dell'API
 
 # ✅ Configurazione logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
-def connect_db():
-    """🔗 Connessione al database PostgreSQL."""
-    try:
-        conn = psycopg2.connect(
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            host=DB_HOST,
-            port=DB_PORT
-        )
-        conn.set_client_encoding('UTF8')
-        logging.info("✅ Connessione al database avvenuta con successo!")
-        return conn
-    except Exception as e:
-        logging.error(f"❌ Errore di connessione al database: {e}")
-        return None      
+# 📌 Righe per ogni COPY nella tabella di staging
+BULK_SAVE_BATCH_SIZE = int(os.getenv("BULK_SAVE_BATCH_SIZE", 5000))
+
+# Colonne di product_prices caricate in blocco (stesso ordine di save_product_data)
+PRODUCT_COLUMNS = ("asin", "name", "price", "old_price", "discount", "description", "rating", "reviews",
+                   "availability", "image_url", "affiliate_link", "category", "offer_text")
+COPY_NULL = "\\N"
+# Disponibilità dei prodotti nuovi la cui pagina non la indica (availability è NOT NULL)
+AVAILABILITY_UNKNOWN = "Sconosciuta"
+# Campi testuali che l'estrazione lascia a "N/A" quando non trova il nodo: non sovrascrivono quelli salvati
+EXTRACTED_TEXT_COLUMNS = ("name", "description", "image_url")
+# Campi che determinano l'impronta della riga (old_price è calcolato dal database)
+FINGERPRINT_COLUMNS = tuple(c for c in PRODUCT_COLUMNS if c not in ("asin", "old_price"))
 
 def create_tables():
     """🛠️ Crea/Aggiorna tutte le tabelle del database."""
-    conn = connect_db()
-    if not conn:
-        return
-    try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS product_prices (
-                    id SERIAL PRIMARY KEY,
-                    asin TEXT UNIQUE NOT NULL,
-                    name TEXT NOT NULL,
-                    price FLOAT CHECK (price > 0),
-                    old_price FLOAT,
-                    discount FLOAT,
-                    description TEXT,
-                    rating FLOAT,
-                    reviews INT,
-                    availability TEXT NOT NULL,
-                    image_url TEXT,
-                    affiliate_link TEXT,
-                    category TEXT NOT NULL,
-                    offer_text TEXT,  -- ✅ Aggiunto campo per offerte speciali
-                    scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-                CREATE INDEX IF NOT EXISTS idx_product_prices_asin ON product_prices(asin);
-            """)
-        conn.commit()
-        logging.info("✅ Tabelle create/verificate con successo.")
-    except Exception as e:
-        logging.error(f"❌ Errore nella creazione delle tabelle: {e}")
-    finally:
-        conn.close()
-
-def check_product_exists(asin):
-    """🔍 Controlla se un prodotto con un determinato ASIN esiste nel database."""
-    conn = connect_db()
-    if not conn:
-        return False
-    try:
-        with conn.cursor() as cur:
-            cur.execute("SELECT 1 FROM product_prices WHERE asin = %s", (asin,))
-            exists = cur.fetchone() is not None
-            return exists
-    except Exception as e:
-        logging.error(f"❌ Errore nel controllo dell'ASIN {asin}: {e}")
-        return False
-    finally:
-        conn.close()
+    with get_connection() as conn:
+        if not conn:
+            return
+        try:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    CREATE TABLE IF NOT EXISTS product_prices (
+                        id SERIAL PRIMARY KEY,
+                        asin TEXT UNIQUE NOT NULL,
+                        name TEXT NOT NULL,
+                        price FLOAT CHECK (price > 0),
+                        old_price FLOAT,
+                        discount FLOAT,
+                        description TEXT,
+                        rating FLOAT,
+                        reviews INT,
+                        availability TEXT NOT NULL,
+                        image_url TEXT,
+                        affiliate_link TEXT,
+                        category TEXT NOT NULL,
+                        offer_text TEXT,  -- ✅ Aggiunto campo per offerte speciali
+                        scraped_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    );
+                    CREATE INDEX IF NOT EXISTS idx_product_prices_asin ON product_prices(asin);
+                    -- ✅ Impronta dei campi tracciati e ultimo avvistamento (scraped_at = ultima modifica)
+                    ALTER TABLE product_prices ADD COLUMN IF NOT EXISTS fingerprint TEXT;
+                    ALTER TABLE product_prices ADD COLUMN IF NOT EXISTS last_seen_at TIMESTAMP;
+
+                    -- ✅ Categoria normalizzata e vettore di ricerca, calcolati dal database
+                    ALTER TABLE product_prices ADD COLUMN IF NOT EXISTS category_key TEXT
+                        GENERATED ALWAYS AS (regexp_replace(lower(btrim(category)), '\\s+', ' ', 'g')) STORED;
+                    ALTER TABLE product_prices ADD COLUMN IF NOT EXISTS search_vector tsvector
+                        GENERATED ALWAYS AS (to_tsvector('simple', coalesce(name, '') || ' ' || coalesce(category, ''))) STORED;
+                    CREATE INDEX IF NOT EXISTS idx_product_prices_category ON product_prices(category);
+                    CREATE INDEX IF NOT EXISTS idx_product_prices_category_key ON product_prices(category_key);
+                    CREATE INDEX IF NOT EXISTS idx_product_prices_search ON product_prices USING GIN (search_vector);
+
+                    -- ✅ Ordinamenti paginati di /api/prodotti (stesse espressioni di product_queries.SORT_EXPRESSIONS)
+                    CREATE INDEX IF NOT EXISTS idx_product_prices_price_sort ON product_prices ((COALESCE(price, 0)), asin);
+                    CREATE INDEX IF NOT EXISTS idx_product_prices_discount_sort ON product_prices ((COALESCE(discount, 0)), asin);
+                    CREATE INDEX IF NOT EXISTS idx_product_prices_rating_sort ON product_prices ((COALESCE(rating, 0)), asin);
+                    CREATE INDEX IF NOT EXISTS idx_product_prices_name_sort ON product_prices ((COALESCE(name, '')), asin);
+
+                    -- ✅ Pianificazione degli aggiornamenti in base alla volatilità del prezzo
+                    CREATE TABLE IF NOT EXISTS scrape_schedule (
+                        asin TEXT PRIMARY KEY,
+                        change_rate FLOAT NOT NULL DEFAULT 0,  -- variazioni di prezzo al giorno
+                        interval_hours FLOAT NOT NULL,
+                        last_checked_at TIMESTAMP,
+                        next_due_at TIMESTAMP NOT NULL
+                    );
+                    CREATE INDEX IF NOT EXISTS idx_scrape_schedule_next_due ON scrape_schedule(next_due_at);
+
+                    -- ✅ Cache persistente dei link affiliati (affiliate_link NULL = risultato negativo)
+                    CREATE TABLE IF NOT EXISTS affiliate_links (
+                        asin TEXT PRIMARY KEY,
+                        affiliate_link TEXT,
+                        fetched_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+                    );
+                """)
+                # ✅ Storico prezzi partizionato per mese (price_history.py)
+                create_price_history(cur)
+                create_generation_table(cur)
+            conn.commit()
+            logging.info("✅ Tabelle create/verificate con successo.")
+        except Exception as e:
+            logging.error(f"❌ Errore nella creazione delle tabelle: {e}")
+
+def get_known_prices(asins):
+    """🔍 Restituisce {asin: prezzo} per gli ASIN già presenti, con una sola query."""
+    if not asins:
+        return {}
+    with get_connection() as conn:
+        if not conn:
+            return {}
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT asin, price FROM product_prices WHERE asin = ANY(%s)", (list(asins),))
+                return dict(cur.fetchall())
+        except Exception as e:
+            logging.error(f"❌ Errore nel controllo degli ASIN noti: {e}")
+            return {}
+
+def iter_products(category=None):
+    """🌊 Prodotti uno alla volta (cursore lato server), inclusi sconti e offerte speciali."""
+    query = """
+        SELECT asin, name, price, old_price, discount, description, rating, 
+               reviews, availability, image_url, affiliate_link, category, offer_text
+        FROM product_prices
+    """
+    if category:
+        query += " WHERE category_key = regexp_replace(lower(btrim(%s)), '\\s+', ' ', 'g')"
+        return iter_rows(query, (category,))
+    return iter_rows(query)
 
 def get_products(category=None):
     """📥 Estrae tutti i prodotti dal database, inclusi gli sconti e le offerte speciali."""
-    conn = connect_db()
-    if not conn:
-        return []
-
     try:
-        with conn.cursor() as cur:
-            query = """
-                SELECT asin, name, price, old_price, discount, description, rating, 
-                       reviews, availability, image_url, affiliate_link, category, offer_text
-                FROM product_prices
-            """
-            if category:
-                query += " WHERE category = %s;"
-                cur.execute(query, (category,))
-            else:
-                query += ";"
-                cur.execute(query)
-
-            prodotti = cur.fetchall()
-            return [
-                {
-                    "asin": row[0],
-                    "name": row[1],
-                    "price": row[2],
-                    "old_price": row[3],
-                    "discount": row[4],
-                    "description": row[5],
-                    "rating": row[6],
-                    "reviews": row[7],
-                    "availability": row[8],
-                    "image_url": row[9],
-                    "affiliate_link": row[10],
-                    "category": row[11],
-                    "offer_text": row[12]  # ✅ Aggiunto il testo dell'offerta
-                } for row in prodotti
-            ]
+        return list(iter_products(category))
     except Exception as e:
         print(f"❌ Errore nel recupero dei prodotti: {e}")
         return []
-    finally:
-        conn.close()
 
-def save_product_data(asin, name, price, old_price, discount, description, rating, reviews, availability, image_url, affiliate_link, category, offer_text=None):
-    """💾 Salva o aggiorna i dati di un prodotto nel database."""
-    conn = connect_db()
-    if not conn:
-        return
-    try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                INSERT INTO product_prices (asin, name, price, old_price, discount, description, rating, reviews, availability, image_url, affiliate_link, category, offer_text, scraped_at)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
-                ON CONFLICT (asin) DO UPDATE
-                SET name = EXCLUDED.name, 
-                    price = EXCLUDED.price, 
-                    old_price = CASE 
-                        WHEN product_prices.old_price IS NULL THEN product_prices.price 
-                        ELSE product_prices.old_price 
-                    END,
-                    discount = EXCLUDED.discount, 
-                    description = EXCLUDED.description, 
-                    rating = EXCLUDED.rating, 
-                    reviews = EXCLUDED.reviews, 
-                    availability = EXCLUDED.availability, 
-                    image_url = EXCLUDED.image_url, 
-                    affiliate_link = EXCLUDED.affiliate_link, 
-                    category = EXCLUDED.category, 
-                    offer_text = EXCLUDED.offer_text,
-                    scraped_at = NOW();
-            """, (asin, name, price, old_price, discount, description, rating, reviews, availability, image_url, affiliate_link, category, offer_text))
-        conn.commit()
-        
-        # ✅ Se il link affiliato è mancante, lo recuperiamo tramite API
-        if not affiliate_link or "N/A" in affiliate_link:
-            fetch_and_update_affiliate_link(asin)
+def get_all_products(batch_size=DB_STREAM_ITERSIZE):
+    """🌊 Tutti i prodotti per il report, a blocchi di tuple (ASIN, nome, prezzi, rating, URL, immagine)."""
+    for _, rows in iter_batches("""
+        SELECT asin, name, price, old_price, discount, rating, reviews, affiliate_link, image_url
+        FROM product_prices
+        ORDER BY asin
+    """, batch_size=batch_size):
+        yield rows
 
+def count_products():
+    """🔢 Numero di prodotti nel database."""
+    with get_connection() as conn:
+        if not conn:
+            return 0
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT COUNT(*) FROM product_prices")
+                return cur.fetchone()[0]
+        except Exception as e:
+            logging.error(f"❌ Errore nel conteggio dei prodotti: {e}")
+            return 0
+
+def save_product_data(asin, name, price, old_price, discount, description, rating, reviews, availability, image_url, affiliate_link, category, offer_text=None):
+    """💾 Salva o aggiorna i dati di un prodotto nel database (stesso percorso del salvataggio in blocco)."""
+    record = {
+        "asin": asin, "name": name, "price": price, "old_price": old_price, "discount": discount,
+        "description": description, "rating": rating, "reviews": reviews, "availability": availability,
+        "image_url": image_url, "affiliate_link": affiliate_link, "category": category, "offer_text": offer_text,
+    }
+    if save_products_bulk([record]):
         logging.info(f"✅ Dati salvati per ASIN {asin} - Categoria: {category}")
-    except Exception as e:
-        logging.error(f"❌ Errore nel salvataggio dati di {asin}: {e}")
-    finally:
-        conn.close()
+
+def row_fingerprint(record):
+    """🔑 Impronta dei campi tracciati: se non cambia, la riga non viene riscritta."""
+    values = json.dumps([record.get(column) for column in FINGERPRINT_COLUMNS], ensure_ascii=False, default=str)
+    return hashlib.md5(values.encode("utf-8")).hexdigest()
+
+def _is_incomplete(record):
+    return not (record.get("category") and record.get("availability")) \
+        or any(record.get(column) in (None, "N/A") for column in EXTRACTED_TEXT_COLUMNS)
+
+def _fill_missing(record, stored):
+    """
+    🧩 Campi non estratti (categoria, disponibilità, testi a "N/A"): quelli salvati,
+    o AVAILABILITY_UNKNOWN come disponibilità dei prodotti nuovi.
+    """
+    stored = stored or {}
+    filled = {column: stored[column] for column in EXTRACTED_TEXT_COLUMNS
+              if record.get(column) in (None, "N/A") and stored.get(column) not in (None, "N/A")}
+    if not record.get("category"):
+        filled["category"] = stored.get("category")
+    if not record.get("availability"):
+        filled["availability"] = stored.get("availability") or AVAILABILITY_UNKNOWN
+    return {**record, **filled} if filled else record
+
+def _rejection_reason(record):
+    """🚫 Motivo per cui il record violerebbe i vincoli di product_prices, o None se è valido."""
+    for column in ("asin", "name", "category", "availability"):
+        if record.get(column) is None:
+            return f"{column} mancante"
+    if record.get("price") is not None and record["price"] <= 0:
+        return f"prezzo non valido ({record['price']})"
+    return None
+
+def _copy_rows(cur, records):
+    """📤 Carica i record nella tabella di staging con COPY (un solo round trip)."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for seq, record in enumerate(records):
+        # None diventa \N (NULL di COPY); le stringhe vuote restano stringhe vuote
+        observed_at = record.get("observed_at")
+        writer.writerow([seq] + [COPY_NULL if record.get(column) is None else record[column] for column in PRODUCT_COLUMNS]
+                        + [row_fingerprint(record), COPY_NULL if observed_at is None else observed_at.isoformat(sep=" ")])
+    buffer.seek(0)
+    cur.copy_expert(
+        f"COPY product_prices_staging (seq, {', '.join(PRODUCT_COLUMNS)}, fingerprint, observed_at) FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')",
+        buffer,
+    )
+
+def save_products_bulk(records, batch_size=BULK_SAVE_BATCH_SIZE, fetch_links=True):
+    """
+    💾 Salva o aggiorna molti prodotti: COPY in una tabella temporanea di staging e
+    un solo INSERT ... SELECT ... ON CONFLICT per blocco, con la logica storica di old_price.
+    Le righe con impronta invariata aggiornano solo last_seen_at; price_history riceve una riga
+    solo se cambiano prezzo o disponibilità. Ritorna il numero di prodotti salvati.
+    Un record con "observed_at" (datetime con fuso, es. pagina archiviata) viene datato a quell'istante
+    e ignorato se il database ha già un'osservazione più recente dello stesso ASIN.
+    Con fetch_links=False i link affiliati mancanti non vengono chiesti alla PA-API.
+    """
+    saved = 0
+    missing_links = []
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            saved += _merge_batch(batch, missing_links)
+            batch = []
+    if batch:
+        saved += _merge_batch(batch, missing_links)
+
+    # ✅ Link affiliati mancanti recuperati in blocco, dopo aver restituito la connessione al pool
+    if missing_links and fetch_links:
+        fetch_and_update_affiliate_links(missing_links)
+    return saved
+
+def _merge_batch(records, missing_links):
+    ensure_current_partition()
+    observed = [r["observed_at"] for r in records if r.get("observed_at")]
+    with get_connection() as conn:
+        if not conn:
+            return 0
+        try:
+            with conn.cursor() as cur:
+                # Tabella temporanea della sessione: svuotata a ogni commit, riusata dalla connessione del pool
+                cur.execute("""
+                    CREATE TEMP TABLE IF NOT EXISTS product_prices_staging (
+                        seq INT,
+                        asin TEXT,
+                        name TEXT,
+                        price FLOAT,
+                        old_price FLOAT,
+                        discount FLOAT,
+                        description TEXT,
+                        rating FLOAT,
+                        reviews INT,
+                        availability TEXT,
+                        image_url TEXT,
+                        affiliate_link TEXT,
+                        category TEXT,
+                        offer_text TEXT,
+                        fingerprint TEXT,
+                        observed_at TIMESTAMPTZ
+                    ) ON COMMIT DELETE ROWS;
+                """)
+                # L'HTML non indica la disponibilità, le pagine prodotto (aggiornamenti per ASIN)
+                # nemmeno la categoria, e un selettore mancato dà "N/A": restano i valori salvati
+                incomplete = [r["asin"] for r in records if r.get("asin") and _is_incomplete(r)]
+                if incomplete:
+                    columns = ("category", "availability") + EXTRACTED_TEXT_COLUMNS
+                    cur.execute(f"SELECT asin, {', '.join(columns)} FROM product_prices WHERE asin = ANY(%s)", (incomplete,))
+                    stored = {row[0]: dict(zip(columns, row[1:])) for row in cur.fetchall()}
+                    records = [_fill_missing(r, stored.get(r.get("asin"))) for r in records]
+                rejected = [(r.get("asin"), reason) for r in records for reason in [_rejection_reason(r)] if reason]
+                if rejected:
+                    records = [r for r in records if not _rejection_reason(r)]
+                    logging.warning(f"⚠️ Salvataggio in blocco: {len(rejected)} record non validi scartati: "
+                                    + ", ".join(f"{asin} ({reason})" for asin, reason in rejected[:20])
+                                    + (" ..." if len(rejected) > 20 else ""))
+                if observed:
+                    # Osservazioni datate (replay): servono le partizioni di price_history dei loro mesi
+                    # (un giorno di margine: il mese nel fuso della sessione può differire da quello UTC)
+                    ensure_partitions(cur, min(observed) - timedelta(days=1), max(observed) + timedelta(days=1))
+                _copy_rows(cur, records)
+                # DISTINCT ON: a parità di ASIN vince l'osservazione più recente (poi l'ultimo record),
+                # come con salvataggi successivi; senza observed_at l'osservazione è di adesso.
+                # Le righe che violerebbero i vincoli vengono scartate invece di annullare il blocco,
+                # e così quelle datate più vecchie dell'ultimo avvistamento già salvato.
+                # prev legge lo stato precedente: tutte le CTE vedono la stessa fotografia del database.
+                cur.execute("""
+                    WITH incoming AS (
+                        SELECT DISTINCT ON (s.asin) s.*, COALESCE(s.observed_at, NOW())::timestamp AS seen_at
+                        FROM product_prices_staging s
+                        WHERE s.asin IS NOT NULL AND s.name IS NOT NULL AND s.availability IS NOT NULL
+                          AND s.category IS NOT NULL AND (s.price IS NULL OR s.price > 0)
+                          AND (s.observed_at IS NULL OR NOT EXISTS (
+                              SELECT 1 FROM product_prices pp
+                              WHERE pp.asin = s.asin AND COALESCE(pp.last_seen_at, pp.scraped_at) >= s.observed_at))
+                        ORDER BY s.asin, COALESCE(s.observed_at, 'infinity') DESC, s.seq DESC
+                    ),
+                    prev AS (
+                        SELECT pp.asin, pp.price, pp.availability
+                        FROM product_prices pp JOIN incoming USING (asin)
+                    ),
+                    upserted AS (
+                        INSERT INTO product_prices (asin, name, price, old_price, discount, description, rating, reviews, availability, image_url, affiliate_link, category, offer_text, fingerprint, scraped_at, last_seen_at)
+                        SELECT asin, name, price, old_price, discount, description, rating, reviews, availability, image_url, affiliate_link, category, offer_text, fingerprint, seen_at, seen_at
+                        FROM incoming
+                        ON CONFLICT (asin) DO UPDATE
+                        SET name = EXCLUDED.name, 
+                            price = EXCLUDED.price, 
+                            old_price = CASE 
+                                WHEN product_prices.old_price IS NULL THEN product_prices.price 
+                                ELSE product_prices.old_price 
+                            END,
+                            discount = EXCLUDED.discount, 
+                            description = EXCLUDED.description, 
+                            rating = EXCLUDED.rating, 
+                            reviews = EXCLUDED.reviews, 
+                            availability = EXCLUDED.availability, 
+                            image_url = EXCLUDED.image_url, 
+                            affiliate_link = EXCLUDED.affiliate_link, 
+                            category = EXCLUDED.category, 
+                            offer_text = EXCLUDED.offer_text,
+                            fingerprint = EXCLUDED.fingerprint,
+                            scraped_at = EXCLUDED.scraped_at,
+                            last_seen_at = EXCLUDED.last_seen_at
+                        WHERE product_prices.fingerprint IS DISTINCT FROM EXCLUDED.fingerprint
+                        RETURNING asin, price, availability
+                    ),
+                    seen AS (
+                        -- Impronta invariata: si aggiorna solo l'ultimo avvistamento
+                        UPDATE product_prices pp
+                        SET last_seen_at = incoming.seen_at
+                        FROM incoming
+                        WHERE pp.asin = incoming.asin AND pp.fingerprint = incoming.fingerprint
+                        RETURNING pp.asin
+                    )
+                    SELECT u.asin, (p.asin IS NULL OR p.price IS DISTINCT FROM u.price
+                                    OR p.availability IS DISTINCT FROM u.availability) AS changed,
+                           TRUE AS rewritten
+                    FROM upserted u LEFT JOIN prev p USING (asin)
+                    UNION ALL
+                    SELECT asin, FALSE, FALSE FROM seen;
+                """)
+                results = cur.fetchall()
+                saved_asins = [asin for asin, _, _ in results]
+                changed_asins = [asin for asin, changed, _ in results if changed]
+                record_observations(cur, changed_asins, saved_asins)
+                # Solo le righe riscritte cambiano le risposte dell'API (last_seen_at non è esposto)
+                if any(rewritten for _, _, rewritten in results):
+                    bump_generation(cur)
+            conn.commit()
+        except Exception as e:
+            logging.error(f"❌ Errore nel salvataggio in blocco di {len(records)} prodotti: {e}")
+            return 0
+
+    known_asins.add_many(saved_asins)
+    saved = len(saved_asins)
+    distinct = len({r["asin"] for r in records})
+    if distinct < len(records):
+        logging.info(f"ℹ️ Salvataggio in blocco: {len(records) - distinct} record duplicati (vince il più recente).")
+    if saved < distinct:
+        logging.info(f"ℹ️ Salvataggio in blocco: {distinct - saved} record più vecchi dei dati salvati ignorati.")
+    missing_links.extend(
+        r["asin"] for r in records
+        if r.get("asin") and r["asin"] != "N/A" and (not r.get("affiliate_link") or "N/A" in r["affiliate_link"])
+    )
+    logging.info(f"✅ Salvataggio in blocco: {saved} prodotti, {len(changed_asins)} con prezzo o disponibilità cambiati.")
+    return saved
 
 def fetch_and_update_affiliate_link(asin):
     """🔗 Recupera il link affiliato tramite API Amazon e aggiorna il database"""
-    conn = connect_db()
-    if not conn:
+    fetch_and_update_affiliate_links([asin])
+
+def fetch_and_update_affiliate_links(asins):
+    """
+    🔗 Versione in blocco: aggiorna i link mancanti di più ASIN con richieste GetItems da 10.
+    Nessuna connessione resta in prestito durante le chiamate PA-API (limitate, possono attendere secondi):
+    lettura degli ASIN senza link, rilascio, PA-API, poi una nuova connessione per l'UPDATE.
+    """
+    with get_connection() as conn:
+        if not conn:
+            return
+        try:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT asin FROM product_prices
+                    WHERE asin = ANY(%s) AND (affiliate_link IS NULL OR affiliate_link LIKE '%%N/A%%');
+                """, (list(asins),))
+                missing = [row[0] for row in cur.fetchall()]
+            conn.rollback()  # Fine della transazione di sola lettura prima di restituire la connessione
+        except Exception as e:
+            logging.error(f"❌ Errore nella lettura dei link affiliati mancanti: {e}")
+            return
+    if not missing:
         return
+
     try:
-        with conn.cursor() as cur:
-            cur.execute("SELECT affiliate_link FROM product_prices WHERE asin = %s", (asin,))
-            result = cur.fetchone()
-
-            # Se il link è mancante o non valido, lo aggiorniamo
-            if result and (not result[0] or "N/A" in result[0]):
-                affiliate_link = get_affiliate_link(asin)
-                if affiliate_link and "amazon" in affiliate_link:
-                    cur.execute("""
-                        UPDATE product_prices 
-                        SET affiliate_link = %s 
-                        WHERE asin = %s;
-                    """, (affiliate_link, asin))
-                    conn.commit()
-                    logging.info(f"✅ Link affiliato aggiornato per ASIN {asin}: {affiliate_link}")
+        links = resolve_many(missing)
     except Exception as e:
-        logging.error(f"❌ Errore aggiornamento link affiliato per ASIN {asin}: {e}")
-    finally:
-        conn.close()        
+        logging.error(f"❌ Errore nel recupero dei link affiliati: {e}")
+        return
+    updates = [(link, asin) for asin, link in links.items() if link and "amazon" in link]
+    if not updates:
+        logging.info(f"✅ Link affiliati aggiornati: 0/{len(missing)}")
+        return
+
+    with get_connection() as conn:
+        if not conn:
+            return
+        try:
+            with conn.cursor() as cur:
+                cur.executemany("UPDATE product_prices SET affiliate_link = %s WHERE asin = %s;", updates)
+                bump_generation(cur)
+            conn.commit()
+            logging.info(f"✅ Link affiliati aggiornati: {len(updates)}/{len(missing)}")
+        except Exception as e:
+            logging.error(f"❌ Errore aggiornamento link affiliati in blocco: {e}")
 
 # ✅ Test Database
 if __name__ == "__main__":
@@ -0,0 +1,193 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from psycopg2 import extensions, pool
+from dotenv import load_dotenv
+
+# ✅ Carica variabili d'ambiente
+load_dotenv()
+
+# 📌 Configurazione database PostgreSQL
+DB_NAME = os.getenv("DB_NAME")
+DB_USER = os.getenv("DB_USER")
+DB_PASSWORD = os.getenv("DB_PASSWORD")
+DB_HOST = os.getenv("DB_HOST")
+DB_PORT = os.getenv("DB_PORT")
+
+# 📌 Configurazione del pool di connessioni
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", 1))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+DB_POOL_HEALTHCHECK_IDLE = float(os.getenv("DB_POOL_HEALTHCHECK_IDLE", 30))  # secondi di inattività prima del ping
+
+# 📌 Righe trasferite per ogni round trip dai cursori lato server
+DB_STREAM_ITERSIZE = int(os.getenv("DB_STREAM_ITERSIZE", 2000))
+
+# ✅ Configurazione logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+
+class ConnectionPool:
+    """
+    🏊 Pool di connessioni PostgreSQL condiviso da tutti i moduli.
+    A pool pieno il chiamante attende (fino a DB_POOL_TIMEOUT) invece di ricevere un errore.
+    """
+
+    def __init__(self, minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX, timeout=DB_POOL_TIMEOUT):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self._pool = None
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._last_used = {}  # id(conn) -> ultimo rilascio
+        self._in_use = 0
+        self._checkouts = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = pool.ThreadedConnectionPool(
+                    self.minconn, self.maxconn,
+                    dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD, host=DB_HOST, port=DB_PORT
+                )
+                logger.info(f"✅ Pool database creato (min {self.minconn}, max {self.maxconn}).")
+            return self._pool
+
+    def _is_healthy(self, conn):
+        if conn.closed:
+            return False
+        idle = time.monotonic() - self._last_used.get(id(conn), 0)
+        if idle < DB_POOL_HEALTHCHECK_IDLE:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def getconn(self):
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError(f"Nessuna connessione libera nel pool dopo {self.timeout}s")
+        try:
+            db_pool = self._get_pool()
+            conn = db_pool.getconn()
+            if not self._is_healthy(conn):
+                logger.warning("⚠️ Connessione al database non valida, la sostituisco.")
+                db_pool.putconn(conn, close=True)
+                conn = db_pool.getconn()
+            conn.set_client_encoding('UTF8')
+        except Exception:
+            self._slots.release()
+            raise
+
+        waited = time.monotonic() - started
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+        return conn
+
+    def putconn(self, conn):
+        try:
+            broken = conn.closed != 0
+            if not broken and conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                # Transazione lasciata aperta dal chiamante (es. sola lettura): la chiudiamo
+                conn.rollback()
+        except Exception:
+            broken = True
+        self._last_used[id(conn)] = time.monotonic()
+        try:
+            self._get_pool().putconn(conn, close=broken)
+        finally:
+            with self._lock:
+                self._in_use -= 1
+            self._slots.release()
+
+    def stats(self):
+        """📊 Utilizzo del pool e tempi di attesa per ottenere una connessione."""
+        with self._lock:
+            return {
+                "in_use": self._in_use,
+                "max_size": self.maxconn,
+                "utilisation": round(self._in_use / self.maxconn, 3),
+                "checkouts": self._checkouts,
+                "avg_wait_ms": round(1000 * self._total_wait / self._checkouts, 3) if self._checkouts else 0.0,
+                "max_wait_ms": round(1000 * self._max_wait, 3),
+            }
+
+    def close(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+
+
+_db_pool = ConnectionPool()
+
+
+@contextmanager
+def get_connection():
+    """
+    🔗 Prende in prestito una connessione dal pool e la restituisce all'uscita.
+    Restituisce None se il database non è raggiungibile, come faceva connect_db().
+    """
+    try:
+        conn = _db_pool.getconn()
+    except Exception as e:
+        logger.error(f"❌ Errore di connessione al database: {e}")
+        yield None
+        return
+    try:
+        yield conn
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        _db_pool.putconn(conn)
+
+
+def iter_batches(query, params=None, batch_size=DB_STREAM_ITERSIZE):
+    """
+    🌊 Esegue la query con un cursore lato server e restituisce blocchi (colonne, righe)
+    di al più batch_size tuple: la memoria resta costante qualunque sia la dimensione della tabella.
+    La connessione resta in prestito finché il generatore non è esaurito o chiuso.
+    """
+    with get_connection() as conn:
+        if not conn:
+            return
+        # Cursore con nome = cursore lato server: PostgreSQL invia le righe un blocco alla volta
+        with conn.cursor(name=f"stream_{uuid.uuid4().hex}") as cur:
+            cur.itersize = batch_size
+            cur.execute(query, params)
+            rows = cur.fetchmany(batch_size)
+            columns = [desc[0] for desc in cur.description]
+            while rows:
+                yield columns, rows
+                rows = cur.fetchmany(batch_size)
+
+
+def iter_rows(query, params=None, itersize=DB_STREAM_ITERSIZE):
+    """🌊 Come iter_batches, ma una riga alla volta come dizionario colonna -> valore."""
+    for columns, rows in iter_batches(query, params, itersize):
+        for row in rows:
+            yield dict(zip(columns, row))
+
+
+def pool_stats():
+    return _db_pool.stats()
+
+
+def close_pool():
+    _db_pool.close()
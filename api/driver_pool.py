@@ -0,0 +1,212 @@
+import atexit
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from contextlib import contextmanager
+from selenium import webdriver
+from selenium.webdriver.chrome.service import Service
+from selenium.webdriver.chrome.options import Options
+from webdriver_manager.chrome import ChromeDriverManager
+from page_loader import PAGE_LOAD_TIMEOUT
+
+# ✅ Configurazione logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# 📌 Configurazione pool di browser
+DRIVER_POOL_SIZE = int(os.getenv("DRIVER_POOL_SIZE", 2))
+DRIVER_MAX_PAGES = int(os.getenv("DRIVER_MAX_PAGES", 50))
+DRIVER_ACQUIRE_TIMEOUT = float(os.getenv("DRIVER_ACQUIRE_TIMEOUT", 120))
+# Blocca immagini, font e CSS: non servono per estrarre i dati
+BLOCK_RESOURCES = os.getenv("DRIVER_BLOCK_RESOURCES", "true").lower() in ("1", "true", "yes")
+BLOCKED_URL_PATTERNS = ["*.woff", "*.woff2", "*.ttf", "*.otf", "*.css", "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg"]
+
+_driver_path = None
+_driver_path_lock = threading.Lock()
+
+
+def get_driver_path():
+    """📦 Installa/trova chromedriver una sola volta per processo."""
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path is None:
+            _driver_path = ChromeDriverManager().install()
+        return _driver_path
+
+
+# ✅ Impostazioni WebDriver per Selenium
+def setup_driver():
+    options = Options()
+    options.add_argument("--disable-gpu")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--incognito")
+    options.add_argument("--window-size=1920,1080")
+    options.add_argument(
+        f"user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        f"(KHTML, like Gecko) Chrome/{random.randint(80, 115)}.0.{random.randint(4000, 5000)}.0 Safari/537.36"
+    )
+    # ✅ 'eager': driver.get ritorna appena il DOM è pronto, senza aspettare immagini e iframe
+    options.page_load_strategy = "eager"
+    if BLOCK_RESOURCES:
+        options.add_experimental_option("prefs", {
+            "profile.managed_default_content_settings.images": 2,
+            "profile.managed_default_content_settings.fonts": 2,
+        })
+
+    service = Service(get_driver_path())
+    driver = webdriver.Chrome(service=service, options=options)
+    driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+    if BLOCK_RESOURCES:
+        try:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+        except Exception as e:
+            logger.warning(f"⚠️ Blocco risorse non disponibile: {e}")
+    return driver
+
+
+class DriverSession:
+    """🧭 Sessione Chrome riutilizzabile con contatore delle pagine visitate."""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages = 0
+        self.blocked = False
+        self.created_at = time.monotonic()
+
+    def mark_page(self):
+        self.pages += 1
+
+    def mark_blocked(self):
+        self.blocked = True
+
+    def is_alive(self):
+        """🩺 Health check: il browser risponde ancora ai comandi?"""
+        try:
+            self.driver.execute_script("return 1;")
+            return True
+        except Exception:
+            return False
+
+    def reset(self):
+        """🧹 Pulisce cookie e storage invece di rilanciare il browser."""
+        try:
+            self.driver.delete_all_cookies()
+            self.driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+        except Exception as e:
+            logger.warning(f"⚠️ Reset sessione browser non riuscito: {e}")
+            return False
+        return True
+
+    def quit(self):
+        try:
+            self.driver.quit()
+        except Exception as e:
+            logger.warning(f"⚠️ Errore nella chiusura del browser: {e}")
+
+
+class DriverPool:
+    """🏊 Pool limitato di sessioni Chrome calde, da prendere in prestito e restituire."""
+
+    def __init__(self, size=DRIVER_POOL_SIZE, max_pages=DRIVER_MAX_PAGES, factory=setup_driver):
+        self.size = size
+        self.max_pages = max_pages
+        self.factory = factory
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._closed = False
+
+    def _create_session(self):
+        logger.info("🚀 Avvio nuova sessione Chrome per il pool...")
+        try:
+            return DriverSession(self.factory())
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def _discard(self, session):
+        session.quit()
+        with self._lock:
+            self._created -= 1
+
+    def acquire(self, timeout=DRIVER_ACQUIRE_TIMEOUT):
+        """📥 Restituisce una sessione sana: riusa quelle inattive o ne crea una entro il limite."""
+        deadline = time.monotonic() + timeout
+        while True:
+            if self._closed:
+                raise RuntimeError("Pool di browser chiuso")
+            try:
+                session = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_create = self._created < self.size
+                    if can_create:
+                        self._created += 1
+                if can_create:
+                    return self._create_session()
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError("Nessuna sessione browser disponibile nel pool")
+                try:
+                    session = self._idle.get(timeout=min(remaining, 1.0))
+                except queue.Empty:
+                    continue
+
+            if session.is_alive():
+                return session
+            logger.warning("⚠️ Sessione browser non risponde, la sostituisco.")
+            self._discard(session)
+
+    def release(self, session):
+        """📤 Restituisce la sessione al pool, riciclandola se bloccata o troppo usata."""
+        if self._closed or session.blocked or session.pages >= self.max_pages:
+            reason = "blocco rilevato" if session.blocked else f"{session.pages} pagine visitate"
+            logger.info(f"♻️ Riciclo sessione browser ({reason}).")
+            self._discard(session)
+            return
+        if not session.reset():
+            self._discard(session)
+            return
+        self._idle.put(session)
+
+    @contextmanager
+    def session(self, timeout=DRIVER_ACQUIRE_TIMEOUT):
+        """🔒 Context manager per prendere in prestito una sessione."""
+        session = self.acquire(timeout)
+        try:
+            yield session
+        except Exception:
+            # In caso di errore non sappiamo in che stato sia il browser: meglio scartarlo
+            self._discard(session)
+            raise
+        else:
+            self.release(session)
+
+    def close(self):
+        """🛑 Chiude tutte le sessioni inattive."""
+        self._closed = True
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_driver_pool():
+    """🔁 Pool condiviso dal processo, creato alla prima richiesta."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = DriverPool()
+            atexit.register(_pool.close)
+        return _pool
@@ -0,0 +1,163 @@
+import re
+from lxml import etree, html as lxml_html
+
+# 📌 Motore di estrazione: un solo parsing lxml e selettori XPath precompilati con fallback ordinati
+
+
+def _cls(*names):
+    """🎯 Equivalente XPath di un selettore CSS di classe (es. span.a-price)."""
+    return " and ".join(f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')" for name in names)
+
+
+SEARCH_RESULTS = etree.XPath(
+    f"//div[{_cls('s-main-slot')}]//div[@data-component-type='s-search-result']"
+)
+PRODUCT_PAGE = etree.XPath("//*[@id='productTitle' or @id='dp-container']")
+
+# Ogni campo ha una lista di selettori: il primo che trova un valore vince
+FIELD_SELECTORS = {
+    "name": [
+        etree.XPath(".//h2//a//span"),
+        etree.XPath(f".//span[{_cls('a-size-medium', 'a-color-base')}]"),
+        etree.XPath(f".//span[{_cls('a-text-normal')}]"),
+        etree.XPath(f".//div[{_cls('s-title-instructions-style')}]"),
+    ],
+    "price": [etree.XPath(f".//span[{_cls('a-price')}]//span[{_cls('a-offscreen')}]")],
+    "rating": [etree.XPath(f".//span[{_cls('a-icon-alt')}]")],
+    "reviews": [etree.XPath(f".//span[{_cls('a-size-base')}]")],
+    "image_url": [etree.XPath(f"(.//img[{_cls('s-image')}])[1]/@src")],
+    "description": [etree.XPath(f".//div[{_cls('a-row', 'a-size-small')}]")],
+}
+
+# Selettori della pagina prodotto (/dp/ASIN), usata dagli aggiornamenti per ASIN:
+# i selettori delle card prenderebbero i caroselli della pagina invece del prodotto
+PRODUCT_FIELD_SELECTORS = {
+    "name": [etree.XPath("//span[@id='productTitle']"), etree.XPath("//h1[@id='title']")],
+    "price": [
+        etree.XPath(f"//div[@id='corePrice_feature_div']//span[{_cls('a-price')}]//span[{_cls('a-offscreen')}]"),
+        etree.XPath(f"//div[@id='corePriceDisplay_desktop_feature_div']//span[{_cls('a-price')}]//span[{_cls('a-offscreen')}]"),
+    ],
+    "rating": [etree.XPath(f"//*[@id='acrPopover']//span[{_cls('a-icon-alt')}]")],
+    "reviews": [etree.XPath("//span[@id='acrCustomerReviewText']")],
+    "image_url": [etree.XPath("//img[@id='landingImage']/@src")],
+}
+FEATURE_BULLETS = etree.XPath("//div[@id='feature-bullets']//li")
+
+BLOCK_MESSAGES = [
+    "Enter the characters you see below",
+    "Sorry! Something went wrong!",
+    "Spiacenti, si è verificato un problema!"
+]
+
+
+# ✅ Pulisce il prezzo e lo converte in float
+def clean_price(price_text):
+    if price_text and isinstance(price_text, str):
+        price_text = re.sub(r"[^\d,]", "", price_text).replace(",", ".")
+        try:
+            return float(price_text)
+        except ValueError:
+            return None
+    return None
+
+
+# ✅ Converte le recensioni in float
+def clean_rating(rating_text):
+    if rating_text and isinstance(rating_text, str):
+        rating_match = re.search(r"(\d+,\d+|\d+)", rating_text)
+        if rating_match:
+            return float(rating_match.group().replace(",", "."))
+    return None
+
+
+def parse_html(page_html):
+    """📄 Parsing unico della pagina con lxml."""
+    return lxml_html.fromstring(page_html)
+
+
+def is_blocked(doc):
+    """🚫 Amazon ha mostrato il captcha o una pagina di errore?"""
+    text = doc.text_content()
+    return any(msg in text for msg in BLOCK_MESSAGES)
+
+
+def has_expected_content(doc, search_type="search"):
+    """🔎 La pagina contiene i nodi che l'estrazione si aspetta?"""
+    selector = PRODUCT_PAGE if search_type == "asin" else SEARCH_RESULTS
+    return len(selector(doc)) > 0
+
+
+def search_results(doc):
+    """🔎 Le card dei risultati di ricerca."""
+    return SEARCH_RESULTS(doc)
+
+
+def _text(node):
+    # Stesso comportamento di BeautifulSoup.get_text(strip=True)
+    return "".join(part.strip() for part in node.itertext())
+
+
+def _first(root, field, default="N/A", selectors=FIELD_SELECTORS):
+    for selector in selectors[field]:
+        matches = selector(root)
+        if matches:
+            # Il primo nodo trovato vince anche se vuoto, come select_one
+            match = matches[0]
+            return str(match) if isinstance(match, str) else _text(match)
+    return default
+
+
+def _feature_bullets(root):
+    """📝 Descrizione della pagina prodotto: i punti elenco delle caratteristiche."""
+    bullets = [text for text in (_text(li) for li in FEATURE_BULLETS(root)) if text]
+    return " | ".join(bullets) if bullets else "N/A"
+
+
+def extract_product_page(doc, asin):
+    """📦 Estrae i campi di una pagina prodotto (/dp/ASIN) con i suoi selettori."""
+    def first(field):
+        return _first(doc, field, selectors=PRODUCT_FIELD_SELECTORS)
+
+    # "1.234 voti" -> 1234
+    reviews = re.sub(r"\D", "", first("reviews"))
+
+    return {
+        "asin": asin,
+        "name": first("name"),
+        "price": clean_price(first("price")),
+        "old_price": None,
+        "discount": None,
+        "description": _feature_bullets(doc),
+        "rating": clean_rating(first("rating")),
+        "reviews": int(reviews) if reviews else None,
+        "availability": None,
+        "image_url": first("image_url"),
+        "affiliate_link": None,
+        # Una pagina prodotto non indica la categoria: si conserva quella salvata
+        "category": None,
+        "offer_text": None
+    }
+
+
+def extract_product(root, query, search_type="search"):
+    """📦 Estrae tutti i campi di una card (o di una pagina prodotto) in un solo passaggio."""
+    if search_type == "asin":
+        return extract_product_page(root, query)
+    asin = root.get("data-asin", "N/A")
+    reviews_raw = _first(root, "reviews")
+
+    return {
+        "asin": asin,
+        "name": _first(root, "name"),
+        "price": clean_price(_first(root, "price")),
+        "old_price": None,
+        "discount": None,
+        "description": _first(root, "description"),
+        "rating": clean_rating(_first(root, "rating")),
+        "reviews": int(re.sub(r"\D", "", reviews_raw)) if reviews_raw.isdigit() else None,
+        "availability": None,
+        "image_url": _first(root, "image_url"),
+        "affiliate_link": None,
+        "category": query,
+        "offer_text": None  # Questo sarà aggiornato con le offerte speciali
+    }
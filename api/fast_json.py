@@ -0,0 +1,68 @@
+import gzip
+import json
+import os
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from email.utils import format_datetime
+
+# orjson e brotli sono opzionali: senza, si usano json e gzip della libreria standard
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 📌 Compressione delle risposte JSON
+JSON_COMPRESS_MIN_BYTES = int(os.getenv("JSON_COMPRESS_MIN_BYTES", 1024))  # sotto questa soglia non conviene
+JSON_GZIP_LEVEL = int(os.getenv("JSON_GZIP_LEVEL", 6))
+JSON_BROTLI_QUALITY = int(os.getenv("JSON_BROTLI_QUALITY", 4))  # qualità bassa: veloce, rapporto già migliore di gzip
+
+
+def json_default(o):
+    """🧩 Tipi non JSON, convertiti come fa jsonify di Flask (date in formato HTTP, Decimal come stringa)."""
+    if isinstance(o, datetime):
+        return format_datetime(o if o.tzinfo else o.replace(tzinfo=timezone.utc), usegmt=True)
+    if isinstance(o, date):
+        return format_datetime(datetime(o.year, o.month, o.day, tzinfo=timezone.utc), usegmt=True)
+    if isinstance(o, Decimal):
+        return str(o)
+    raise TypeError(f"Tipo non serializzabile in JSON: {type(o).__name__}")
+
+
+def dumps(obj):
+    """⚡ Serializza in JSON (bytes UTF-8), con orjson se installato."""
+    if orjson is not None:
+        # Le date passano da json_default per restare nel formato di jsonify
+        return orjson.dumps(obj, default=json_default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+    return json.dumps(obj, default=json_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def choose_encoding(accept_encoding):
+    """🗜️ Codifica preferita tra quelle accettate dal client: br (se disponibile), poi gzip, altrimenti None."""
+    accepted = set()
+    for item in (accept_encoding or "").split(","):
+        name, _, params = item.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(name.strip().lower())
+    if brotli is not None and ("br" in accepted or "*" in accepted):
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def compress_body(body, accept_encoding):
+    """🗜️ Ritorna (corpo, codifica): il corpo compresso se abbastanza grande e accettato, altrimenti invariato."""
+    if len(body) < JSON_COMPRESS_MIN_BYTES:
+        return body, None
+    encoding = choose_encoding(accept_encoding)
+    if encoding == "br":
+        return brotli.compress(body, quality=JSON_BROTLI_QUALITY), encoding
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=JSON_GZIP_LEVEL, mtime=0), encoding
+    return body, None
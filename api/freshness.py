@@ -0,0 +1,151 @@
+import heapq
+import logging
+import os
+from datetime import datetime
+from db_pool import get_connection
+
+# ✅ Configurazione logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# 📌 Limiti dell'intervallo di aggiornamento per ASIN (ore)
+FRESHNESS_MIN_HOURS = float(os.getenv("FRESHNESS_MIN_HOURS", 2))
+FRESHNESS_MAX_HOURS = float(os.getenv("FRESHNESS_MAX_HOURS", 24 * 7))
+FRESHNESS_BUDGET = int(os.getenv("FRESHNESS_BUDGET", 100))
+FRESHNESS_LOOKBACK_DAYS = int(os.getenv("FRESHNESS_LOOKBACK_DAYS", 90))
+
+
+def refresh_schedule():
+    """
+    🔄 Ricalcola frequenza di variazione e prossima scadenza di ogni ASIN.
+    Ogni prodotto viene controllato circa due volte per ogni variazione di prezzo attesa,
+    entro i limiti FRESHNESS_MIN_HOURS / FRESHNESS_MAX_HOURS.
+    """
+    with get_connection() as conn:
+        if not conn:
+            return 0
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT to_regclass('price_history') IS NOT NULL")
+                if cur.fetchone()[0]:
+                    observations = """
+                        SELECT asin, price, scraped_at,
+                               LAG(price) OVER (PARTITION BY asin ORDER BY scraped_at) AS prev_price
+                        FROM price_history
+                        WHERE scraped_at >= NOW() - make_interval(days => %(lookback)s)
+                    """
+                else:
+                    # Senza storico ogni prodotto riceve l'intervallo massimo invece di non essere pianificato
+                    logger.warning("⚠️ price_history non esiste ancora: pianificazione con l'intervallo massimo.")
+                    observations = """
+                        SELECT NULL::text AS asin, NULL::float AS price, NULL::timestamp AS scraped_at,
+                               NULL::float AS prev_price
+                        WHERE FALSE
+                    """
+                cur.execute(f"""
+                    WITH obs AS ({observations}),
+                    rates AS (
+                        -- price_history riceve righe solo sulle variazioni: il periodo osservato arriva a last_seen_at
+                        SELECT pp.asin, COALESCE(pp.last_seen_at, pp.scraped_at) AS last_seen,
+                               (COUNT(obs.asin) FILTER (WHERE obs.prev_price IS NOT NULL
+                                                        AND obs.price IS DISTINCT FROM obs.prev_price))::float
+                               / GREATEST(EXTRACT(EPOCH FROM COALESCE(pp.last_seen_at, pp.scraped_at) - MIN(obs.scraped_at)) / 86400, 1)::float
+                               AS change_rate
+                        FROM product_prices pp
+                        LEFT JOIN obs ON obs.asin = pp.asin
+                        GROUP BY pp.asin, pp.last_seen_at, pp.scraped_at
+                    ),
+                    intervals AS (
+                        SELECT asin, last_seen, change_rate,
+                               CASE WHEN change_rate > 0
+                                    THEN LEAST(%(max_hours)s, GREATEST(%(min_hours)s, 12.0 / change_rate))
+                                    ELSE %(max_hours)s
+                               END AS interval_hours
+                        FROM rates
+                    )
+                    INSERT INTO scrape_schedule (asin, change_rate, interval_hours, last_checked_at, next_due_at)
+                    SELECT asin, change_rate, interval_hours, last_seen,
+                           last_seen + make_interval(secs => interval_hours * 3600)
+                    FROM intervals
+                    ON CONFLICT (asin) DO UPDATE
+                    SET change_rate = EXCLUDED.change_rate,
+                        interval_hours = EXCLUDED.interval_hours,
+                        next_due_at = COALESCE(scrape_schedule.last_checked_at, EXCLUDED.last_checked_at)
+                                      + make_interval(secs => EXCLUDED.interval_hours * 3600);
+                """, {"lookback": FRESHNESS_LOOKBACK_DAYS, "min_hours": FRESHNESS_MIN_HOURS, "max_hours": FRESHNESS_MAX_HOURS})
+                updated = cur.rowcount
+            conn.commit()
+            logger.info(f"✅ Pianificazione aggiornata per {updated} prodotti.")
+            return updated
+        except Exception as e:
+            logger.error(f"❌ Errore nell'aggiornamento della pianificazione: {e}")
+            return 0
+
+
+def get_due_products(limit):
+    """📥 ASIN scaduti, con frequenza di variazione e ritardo accumulato."""
+    with get_connection() as conn:
+        if not conn:
+            return []
+        try:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT asin, change_rate, interval_hours, next_due_at
+                    FROM scrape_schedule
+                    WHERE next_due_at <= NOW()
+                    ORDER BY next_due_at
+                    LIMIT %s;
+                """, (limit,))
+                return cur.fetchall()
+        except Exception as e:
+            logger.error(f"❌ Errore nel recupero dei prodotti da aggiornare: {e}")
+            return []
+
+
+def mark_checked(asin, interval_hours):
+    """📌 Registra il controllo e sposta in avanti la prossima scadenza."""
+    with get_connection() as conn:
+        if not conn:
+            return
+        try:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    UPDATE scrape_schedule
+                    SET last_checked_at = NOW(),
+                        next_due_at = NOW() + make_interval(secs => %s * 3600)
+                    WHERE asin = %s;
+                """, (interval_hours, asin))
+            conn.commit()
+        except Exception as e:
+            logger.error(f"❌ Errore nell'aggiornamento della scadenza di {asin}: {e}")
+
+
+def run_freshness_cycle(fetch_fn, budget=FRESHNESS_BUDGET):
+    """
+    🎯 Esegue un ciclo di aggiornamento entro il budget di richieste:
+    i prodotti più volatili e più in ritardo vengono controllati per primi.
+    """
+    refresh_schedule()
+    # Si caricano più candidati del budget per scegliere i più urgenti
+    due = get_due_products(budget * 4)
+    now = datetime.now()
+
+    queue = []
+    for asin, change_rate, interval_hours, next_due_at in due:
+        overdue_hours = max((now - next_due_at).total_seconds() / 3600, 0)
+        # Priorità: ritardo relativo all'intervallo, pesato dalla volatilità
+        urgency = (1 + overdue_hours / interval_hours) * (1 + (change_rate or 0))
+        heapq.heappush(queue, (-urgency, asin, interval_hours))
+
+    fetched = 0
+    while queue and fetched < budget:
+        _, asin, interval_hours = heapq.heappop(queue)
+        try:
+            fetch_fn(asin)
+        except Exception as e:
+            logger.error(f"❌ Errore nell'aggiornamento di {asin}: {e}")
+        mark_checked(asin, interval_hours)
+        fetched += 1
+
+    logger.info(f"✅ Ciclo di aggiornamento: {fetched}/{len(due)} prodotti scaduti controllati (budget {budget}).")
+    return fetched
@@ -0,0 +1,171 @@
+import logging
+import os
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from driver_pool import get_driver_pool
+from page_loader import load_page
+from rate_limit import get_host_limiter  # ✅ Cortesia per host invece di sleep globali
+from extractor import parse_html, is_blocked, has_expected_content
+from page_archive import archive_page
+
+# ✅ Configurazione logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# 📌 Configurazione client HTTP
+HTTP_TIMEOUT = float(os.getenv("HTTP_FETCH_TIMEOUT", 10))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", 10))
+HTTP_TIER_ENABLED = os.getenv("HTTP_TIER_ENABLED", "true").lower() in ("1", "true", "yes")
+
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/123.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:125.0) Gecko/20100101 Firefox/125.0",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 14_4) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.4 Safari/605.1.15",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
+]
+
+BASE_HEADERS = {
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+    "Accept-Language": "it-IT,it;q=0.9,en;q=0.6",
+    "Accept-Encoding": "gzip, deflate",
+    "Connection": "keep-alive",
+}
+
+# 🔁 Una sessione keep-alive per thread (requests.Session non è thread-safe)
+_local = threading.local()
+
+
+def _get_session():
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = requests.Session()
+        retry = Retry(total=2, backoff_factor=0.5, status_forcelist=[500, 502, 503, 504], allowed_methods=["GET"])
+        adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE, max_retries=retry)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.headers.update(BASE_HEADERS)
+        _local.session = session
+    return session
+
+
+def _rotating_headers():
+    return {"User-Agent": random.choice(USER_AGENTS)}
+
+
+# ✅ Controlla se Amazon ha bloccato lo scraper
+def check_blocked(doc):
+    return is_blocked(doc)
+
+
+class TierStats:
+    """📊 Tentativi, successi e latenza cumulata di un livello di fetch."""
+
+    def __init__(self):
+        self.attempts = 0
+        self.hits = 0
+        self.total_latency = 0.0
+
+    def record(self, ok, latency):
+        self.attempts += 1
+        self.hits += 1 if ok else 0
+        self.total_latency += latency
+
+    def as_dict(self):
+        return {
+            "attempts": self.attempts,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.attempts, 3) if self.attempts else 0.0,
+            "avg_latency_s": round(self.total_latency / self.attempts, 3) if self.attempts else 0.0,
+        }
+
+
+_stats = {"http": TierStats(), "selenium": TierStats()}
+_stats_lock = threading.Lock()
+
+
+def _record(tier, ok, started):
+    with _stats_lock:
+        _stats[tier].record(ok, time.monotonic() - started)
+
+
+def get_fetch_stats():
+    """📊 Percentuale di successo e latenza media per livello."""
+    with _stats_lock:
+        return {tier: stats.as_dict() for tier, stats in _stats.items()}
+
+
+def log_fetch_stats():
+    for tier, stats in get_fetch_stats().items():
+        logger.info(f"📊 Fetch {tier}: {stats['hits']}/{stats['attempts']} ok "
+                    f"({stats['hit_rate']:.0%}), latenza media {stats['avg_latency_s']}s")
+
+
+def _archive(url, page_html, search_type, tier):
+    # L'archivio non deve mai interrompere lo scraping
+    try:
+        archive_page(url, page_html, search_type, tier)
+    except Exception as e:
+        logger.warning(f"⚠️ Impossibile archiviare {url}: {e}")
+
+
+def fetch_via_http(url, search_type="search"):
+    """🌐 Livello 1: richiesta HTTP semplice con connessioni riutilizzate."""
+    get_host_limiter().acquire(url)
+    started = time.monotonic()
+    try:
+        response = _get_session().get(url, headers=_rotating_headers(), timeout=HTTP_TIMEOUT)
+        if response.status_code != 200:
+            logger.info(f"↪️ HTTP {response.status_code} per {url}, passo a Selenium.")
+            _record("http", False, started)
+            return None
+        _archive(url, response.text, search_type, "http")
+        doc = parse_html(response.text)
+    except Exception as e:
+        logger.info(f"↪️ Errore HTTP per {url} ({e}), passo a Selenium.")
+        _record("http", False, started)
+        return None
+
+    ok = not check_blocked(doc) and has_expected_content(doc, search_type)
+    _record("http", ok, started)
+    if not ok:
+        logger.info(f"↪️ Pagina HTTP bloccata o incompleta per {url}, passo a Selenium.")
+        return None
+    return doc
+
+
+def fetch_via_selenium(url, search_type="search"):
+    """🧭 Livello 2: browser completo preso dal pool."""
+    get_host_limiter().acquire(url)
+    started = time.monotonic()
+    ok = False
+    try:
+        with get_driver_pool().session() as session:
+            page_source = load_page(session.driver, url, search_type)
+            session.mark_page()
+            _archive(url, page_source, search_type, "selenium")
+            doc = parse_html(page_source)
+
+            if check_blocked(doc):
+                # La sessione bloccata viene riciclata dal pool al rilascio
+                session.mark_blocked()
+                return None
+
+        ok = True
+        return doc
+    finally:
+        # Anche i caricamenti falliti (eccezioni di load_page) contano nelle statistiche
+        _record("selenium", ok, started)
+
+
+def fetch_page(url, search_type="search"):
+    """🪜 Prova prima via HTTP, poi Selenium solo se necessario. Ritorna (documento lxml, livello)."""
+    if HTTP_TIER_ENABLED:
+        doc = fetch_via_http(url, search_type)
+        if doc is not None:
+            return doc, "http"
+    return fetch_via_selenium(url, search_type), "selenium"
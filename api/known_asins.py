@@ -0,0 +1,94 @@
+import logging
+import os
+import threading
+from db_pool import get_connection
+
+# ✅ Configurazione logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# 📌 Righe lette per ogni fetch durante il caricamento iniziale
+KNOWN_ASINS_FETCH_SIZE = int(os.getenv("KNOWN_ASINS_FETCH_SIZE", 10000))
+
+
+def get_existing_asins(asins):
+    """🔍 Sottoinsieme degli ASIN già presenti in product_prices, con una sola query."""
+    asins = [asin for asin in dict.fromkeys(asins) if asin and asin != "N/A"]
+    if not asins:
+        return set()
+    with get_connection() as conn:
+        if not conn:
+            return set()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT asin FROM product_prices WHERE asin = ANY(%s)", (asins,))
+                return {row[0] for row in cur.fetchall()}
+        except Exception as e:
+            logger.error(f"❌ Errore nel controllo degli ASIN esistenti: {e}")
+            return set()
+
+
+class KnownAsinSet:
+    """
+    🧠 Insieme in memoria degli ASIN già salvati.
+    Dopo warm() è autorevole per il processo: gli ASIN assenti sono nuovi senza interrogare il database.
+    Prima del caricamento, gli ASIN sconosciuti vengono verificati con una query per blocco.
+    """
+
+    def __init__(self):
+        self._asins = set()
+        self._lock = threading.Lock()
+        self.warmed = False
+        self.stats = {"memory_hits": 0, "db_lookups": 0}
+
+    def warm(self):
+        """🔥 Carica tutti gli ASIN noti con un cursore lato server."""
+        loaded = set()
+        with get_connection() as conn:
+            if not conn:
+                return 0
+            try:
+                with conn.cursor(name="known_asins_warmup") as cur:
+                    cur.itersize = KNOWN_ASINS_FETCH_SIZE
+                    cur.execute("SELECT asin FROM product_prices")
+                    loaded.update(row[0] for row in cur)
+            except Exception as e:
+                logger.error(f"❌ Errore nel caricamento degli ASIN noti: {e}")
+                return 0
+        with self._lock:
+            self._asins |= loaded
+            self.warmed = True
+        logger.info(f"✅ ASIN noti caricati in memoria: {len(loaded)}")
+        return len(loaded)
+
+    def add_many(self, asins):
+        with self._lock:
+            self._asins.update(asin for asin in asins if asin and asin != "N/A")
+
+    def split(self, asins):
+        """📊 Divide una pagina di ASIN in (noti, nuovi) con al più una query."""
+        asins = [asin for asin in dict.fromkeys(asins) if asin and asin != "N/A"]
+        with self._lock:
+            known = {asin for asin in asins if asin in self._asins}
+            self.stats["memory_hits"] += len(known)
+            warmed = self.warmed
+        unknown = [asin for asin in asins if asin not in known]
+
+        if unknown and not warmed:
+            found = get_existing_asins(unknown)
+            with self._lock:
+                self._asins |= found
+                self.stats["db_lookups"] += 1
+            known |= found
+
+        return [asin for asin in asins if asin in known], [asin for asin in asins if asin not in known]
+
+    def __contains__(self, asin):
+        return asin in self.split([asin])[0]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._asins)
+
+
+known_asins = KnownAsinSet()
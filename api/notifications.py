@@ -1,21 +1,14 @@
 import smtplib
 import os
 import logging
-import psycopg2
 from dotenv import load_dotenv
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
+from db_pool import get_connection  # ✅ Pool di connessioni condiviso
 
 # Carica le variabili di ambiente dal file .env
 load_dotenv()
 
-# Configurazione database
-DB_HOST = os.getenv("DB_HOST")
-DB_PORT = os.getenv("DB_PORT")
-DB_NAME = os.getenv("DB_NAME")
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-
 # Configurazione email
 EMAIL_USER = os.getenv("EMAIL_USER")
 EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
@@ -25,36 +18,20 @@ SMTP_PORT = int(os.getenv("SMTP_PORT", 587))
 # Configura il logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-def connect_db():
-    """Connessione al database PostgreSQL."""
-    try:
-        conn = psycopg2.connect(
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            host=DB_HOST,
-            port=DB_PORT
-        )
-        return conn
-    except Exception as e:
-        logging.error(f"❌ Errore di connessione al database: {e}")
-        return None
-
 def get_user_emails():
     """Recupera le email degli utenti dal database."""
-    conn = connect_db()
-    if not conn:
-        return []
+    with get_connection() as conn:
+        if not conn:
+            return []
 
-    try:
-        with conn.cursor() as cur:
-            cur.execute("SELECT email FROM users WHERE subscribed = TRUE;")
-            emails = [row[0] for row in cur.fetchall()]
-        conn.close()
-        return emails
-    except Exception as e:
-        logging.error(f"❌ Errore nel recupero delle email: {e}")
-        return []
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT email FROM users WHERE subscribed = TRUE;")
+                emails = [row[0] for row in cur.fetchall()]
+            return emails
+        except Exception as e:
+            logging.error(f"❌ Errore nel recupero delle email: {e}")
+            return []
 
 def send_email(receiver_email, subject, html_content):
     """Invia un'email HTML al destinatario."""
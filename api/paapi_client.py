@@ -0,0 +1,279 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import List, Optional
+import aiohttp
+from dotenv import load_dotenv
+from rate_limit import get_paapi_limiter  # ✅ Quota PA-API condivisa tra thread e processi
+
+# ✅ Configurazione logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# ✅ Caricamento variabili d'ambiente
+load_dotenv()
+AWS_ACCESS_KEY = os.getenv("AWS_ACCESS_KEY")
+AWS_SECRET_KEY = os.getenv("AWS_SECRET_KEY")
+AWS_ASSOCIATE_TAG = os.getenv("AWS_ASSOCIATE_TAG")
+
+# 📌 Amazon Italia: host e regione di firma PA-API 5
+PAAPI_HOST = os.getenv("PAAPI_HOST", "webservices.amazon.it")
+PAAPI_REGION = os.getenv("PAAPI_REGION", "eu-west-1")
+PAAPI_MARKETPLACE = "www.amazon.it"
+PAAPI_SERVICE = "ProductAdvertisingAPI"
+PAAPI_MAX_CONCURRENCY = int(os.getenv("PAAPI_MAX_CONCURRENCY", 4))
+PAAPI_TIMEOUT = float(os.getenv("PAAPI_TIMEOUT", 10))
+
+DEFAULT_RESOURCES = [
+    "Images.Primary.Large",
+    "ItemInfo.Title",
+    "ItemInfo.Features",
+    "Offers.Listings.Price",
+    "Offers.Listings.SavingBasis",
+    "Offers.Listings.Availability.Message",
+    "Offers.Listings.IsPrimeEligible",
+    "CustomerReviews.Count",
+    "CustomerReviews.StarRating",
+]
+
+
+class PaapiError(Exception):
+    """❌ Errore restituito da PA-API 5."""
+
+    def __init__(self, status, code, message):
+        super().__init__(f"{status} {code}: {message}")
+        self.status = status
+        self.code = code
+
+
+class PaapiThrottled(PaapiError):
+    """⏳ PA-API ha risposto 429 (TooManyRequests)."""
+
+
+def _dig(data, *path):
+    # Accesso sicuro a dizionari/liste annidati della risposta JSON
+    for key in path:
+        if isinstance(data, dict):
+            data = data.get(key)
+        elif isinstance(data, list) and isinstance(key, int) and len(data) > key:
+            data = data[key]
+        else:
+            return None
+    return data
+
+
+@dataclass
+class Item:
+    """📦 Prodotto PA-API con i soli campi usati dal progetto."""
+    asin: str
+    title: Optional[str] = None
+    price: Optional[float] = None
+    currency: Optional[str] = None
+    display_price: Optional[str] = None
+    old_price: Optional[float] = None
+    discount: Optional[float] = None
+    availability: Optional[str] = None
+    rating: Optional[float] = None
+    reviews: Optional[int] = None
+    url: Optional[str] = None
+    image: Optional[str] = None
+    features: List[str] = field(default_factory=list)
+
+    @classmethod
+    def from_json(cls, data):
+        listing = _dig(data, "Offers", "Listings", 0) or {}
+        return cls(
+            asin=data.get("ASIN"),
+            title=_dig(data, "ItemInfo", "Title", "DisplayValue"),
+            price=_dig(listing, "Price", "Amount"),
+            currency=_dig(listing, "Price", "Currency"),
+            display_price=_dig(listing, "Price", "DisplayAmount"),
+            old_price=_dig(listing, "SavingBasis", "Amount"),
+            discount=_dig(listing, "Price", "Savings", "Percentage"),
+            availability=_dig(listing, "Availability", "Message"),
+            rating=_dig(data, "CustomerReviews", "StarRating", "Value"),
+            reviews=_dig(data, "CustomerReviews", "Count"),
+            url=data.get("DetailPageURL"),
+            image=_dig(data, "Images", "Primary", "Large", "URL"),
+            features=_dig(data, "ItemInfo", "Features", "DisplayValues") or [],
+        )
+
+    @property
+    def offer_text(self):
+        return f"-{self.discount}%" if self.discount else None
+
+
+def _sign(key, msg):
+    return hmac.new(key, msg.encode("utf-8"), hashlib.sha256).digest()
+
+
+def sign_request(access_key, secret_key, host, region, path, target, payload, now=None):
+    """🔏 Header firmati AWS Signature Version 4 per una richiesta PA-API 5."""
+    now = now or datetime.now(timezone.utc)
+    amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+    date_stamp = now.strftime("%Y%m%d")
+
+    headers = {
+        "content-encoding": "amz-1.0",
+        "content-type": "application/json; charset=utf-8",
+        "host": host,
+        "x-amz-date": amz_date,
+        "x-amz-target": target,
+    }
+    signed_headers = ";".join(sorted(headers))
+    canonical_headers = "".join(f"{k}:{headers[k]}\n" for k in sorted(headers))
+    canonical_request = "\n".join([
+        "POST", path, "", canonical_headers, signed_headers,
+        hashlib.sha256(payload.encode("utf-8")).hexdigest(),
+    ])
+
+    scope = f"{date_stamp}/{region}/{PAAPI_SERVICE}/aws4_request"
+    string_to_sign = "\n".join([
+        "AWS4-HMAC-SHA256", amz_date, scope,
+        hashlib.sha256(canonical_request.encode("utf-8")).hexdigest(),
+    ])
+    signing_key = _sign(_sign(_sign(_sign(f"AWS4{secret_key}".encode("utf-8"), date_stamp), region), PAAPI_SERVICE), "aws4_request")
+    signature = hmac.new(signing_key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+
+    headers["authorization"] = (
+        f"AWS4-HMAC-SHA256 Credential={access_key}/{scope}, "
+        f"SignedHeaders={signed_headers}, Signature={signature}"
+    )
+    return headers
+
+
+class PaapiClient:
+    """
+    ⚡ Client asincrono PA-API 5: firma SigV4, connessioni keep-alive riutilizzate
+    e concorrenza limitata. `base_url` permette di puntare a un server di test locale.
+    """
+
+    def __init__(self, access_key=AWS_ACCESS_KEY, secret_key=AWS_SECRET_KEY, partner_tag=AWS_ASSOCIATE_TAG,
+                 host=PAAPI_HOST, region=PAAPI_REGION, marketplace=PAAPI_MARKETPLACE, base_url=None,
+                 max_concurrency=PAAPI_MAX_CONCURRENCY, limiter=None):
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.partner_tag = partner_tag
+        self.host = host
+        self.region = region
+        self.marketplace = marketplace
+        self.base_url = base_url or f"https://{host}"
+        self.max_concurrency = max_concurrency
+        self.limiter = limiter or get_paapi_limiter()
+        self._session = None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def open(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=PAAPI_TIMEOUT))
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _call(self, operation, body):
+        await self.open()
+        path = f"/paapi5/{operation.lower()}"
+        payload = json.dumps({
+            **body,
+            "PartnerTag": self.partner_tag,
+            "PartnerType": "Associates",
+            "Marketplace": self.marketplace,
+        })
+        target = f"com.amazon.paapi5.v1.ProductAdvertisingAPIv1.{operation}"
+
+        async with self._semaphore:
+            # Slot prenotato nella quota condivisa: nessuna raffica che provochi 429
+            # reserve() blocca su file (fcntl): in un thread, per non fermare l'event loop
+            wait = await asyncio.to_thread(self.limiter.reserve)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            headers = sign_request(self.access_key, self.secret_key, self.host, self.region, path, target, payload)
+            async with self._session.post(self.base_url + path, data=payload.encode("utf-8"), headers=headers) as response:
+                text = await response.text()
+        try:
+            data = json.loads(text)
+        except ValueError:
+            # Corpo non JSON (es. pagina HTML di errore del gateway)
+            if response.status == 429:
+                raise PaapiThrottled(429, "TooManyRequests", "Troppe richieste")
+            raise PaapiError(response.status, "InvalidResponse", text[:200].strip() or "Risposta non JSON")
+
+        errors = data.get("Errors") if isinstance(data, dict) else None
+        if response.status == 429:
+            raise PaapiThrottled(429, "TooManyRequests", _dig(errors, 0, "Message") or "Troppe richieste")
+        if response.status != 200:
+            raise PaapiError(response.status, _dig(errors, 0, "Code"), _dig(errors, 0, "Message"))
+        if errors:
+            # Risposta parziale: alcuni ASIN non validi o non disponibili
+            for error in errors:
+                logger.warning(f"⚠️ PA-API {operation}: {error.get('Code')} - {error.get('Message')}")
+        return data
+
+    async def get_items(self, asins, resources=None):
+        """📥 GetItems: fino a 10 ASIN per richiesta. Ritorna una lista di Item."""
+        items = []
+        for i in range(0, len(asins), 10):
+            data = await self._call("GetItems", {"ItemIds": list(asins[i:i + 10]), "Resources": resources or DEFAULT_RESOURCES})
+            items.extend(Item.from_json(d) for d in _dig(data, "ItemsResult", "Items") or [])
+        return items
+
+    async def search_items(self, keywords, item_count=10, search_index="All", resources=None):
+        """🔎 SearchItems per parole chiave."""
+        data = await self._call("SearchItems", {
+            "Keywords": keywords,
+            "ItemCount": item_count,
+            "SearchIndex": search_index,
+            "Resources": resources or DEFAULT_RESOURCES,
+        })
+        return [Item.from_json(d) for d in _dig(data, "SearchResult", "Items") or []]
+
+    async def get_variations(self, asin, resources=None):
+        """🎨 GetVariations: varianti (colore, taglia, ...) di un ASIN."""
+        data = await self._call("GetVariations", {"ASIN": asin, "Resources": resources or DEFAULT_RESOURCES})
+        return [Item.from_json(d) for d in _dig(data, "VariationsResult", "Items") or []]
+
+
+# 🔁 Client e event loop condivisi, per usare il client anche da codice sincrono
+_loop = None
+_client = None
+_loop_lock = threading.Lock()
+
+
+def _get_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="paapi-loop", daemon=True).start()
+        return _loop
+
+
+def get_client():
+    """🔁 Client condiviso dal processo: le connessioni keep-alive restano aperte tra le chiamate."""
+    global _client
+    with _loop_lock:
+        if _client is None:
+            _client = PaapiClient()
+        return _client
+
+
+def run_sync(coro, timeout=None):
+    """⏳ Esegue una coroutine sul loop condiviso e ne attende il risultato."""
+    return asyncio.run_coroutine_threadsafe(coro, _get_loop()).result(timeout)
@@ -0,0 +1,237 @@
+import argparse
+import gzip
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from functools import partial
+from urllib.parse import urlparse, parse_qs
+
+# ✅ Configurazione logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# 📌 Archivio delle pagine scaricate (contenuto compresso, indirizzato per hash)
+PAGE_ARCHIVE_ENABLED = os.getenv("PAGE_ARCHIVE_ENABLED", "true").lower() in ("1", "true", "yes")
+PAGE_ARCHIVE_DIR = os.getenv("PAGE_ARCHIVE_DIR", "data/page_archive")
+PAGE_ARCHIVE_TTL_DAYS = float(os.getenv("PAGE_ARCHIVE_TTL_DAYS", 30))
+PAGE_ARCHIVE_MAX_MB = float(os.getenv("PAGE_ARCHIVE_MAX_MB", 2048))
+EVICT_EVERY = 200  # Scritture tra due pulizie automatiche
+
+_lock = threading.Lock()  # Protegge la connessione condivisa e le scritture dei blob
+_writes = 0
+_conn = None
+
+
+def _connect():
+    """🔗 Connessione sqlite condivisa, aperta (e schema creato) alla prima richiesta. Va usata con _lock."""
+    global _conn
+    if _conn is not None:
+        return _conn
+    os.makedirs(PAGE_ARCHIVE_DIR, exist_ok=True)
+    conn = sqlite3.connect(os.path.join(PAGE_ARCHIVE_DIR, "index.sqlite"), timeout=30, check_same_thread=False)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS pages (
+            url TEXT NOT NULL,
+            fetched_at REAL NOT NULL,
+            sha256 TEXT NOT NULL,
+            search_type TEXT,
+            tier TEXT,
+            PRIMARY KEY (url, fetched_at)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS blobs (
+            sha256 TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            created_at REAL NOT NULL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_pages_fetched_at ON pages(fetched_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_pages_sha256 ON pages(sha256)")
+    conn.commit()
+    _conn = conn
+    return conn
+
+
+def _blob_path(sha):
+    return os.path.join(PAGE_ARCHIVE_DIR, "blobs", sha[:2], f"{sha}.html.gz")
+
+
+def archive_page(url, page_html, search_type=None, tier=None):
+    """💾 Salva la pagina grezza. Contenuti identici vengono scritti una sola volta."""
+    global _writes
+    if not PAGE_ARCHIVE_ENABLED:
+        return None
+    data = page_html.encode("utf-8")
+    sha = hashlib.sha256(data).hexdigest()
+    path = _blob_path(sha)
+    fetched_at = time.time()
+    # Compressione fuori dal lock: i thread del crawler non si serializzano su gzip
+    compressed = None if os.path.exists(path) else gzip.compress(data, compresslevel=6)
+    with _lock:
+        conn = _connect()
+        try:
+            if not os.path.exists(path):
+                if compressed is None:
+                    # Rimosso da evict() dopo il controllo precedente
+                    compressed = gzip.compress(data, compresslevel=6)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(compressed)
+                os.replace(tmp_path, path)
+                conn.execute("INSERT OR REPLACE INTO blobs (sha256, size, created_at) VALUES (?, ?, ?)",
+                             (sha, len(compressed), time.time()))
+            conn.execute("INSERT OR REPLACE INTO pages (url, fetched_at, sha256, search_type, tier) VALUES (?, ?, ?, ?, ?)",
+                         (url, fetched_at, sha, search_type, tier))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        _writes += 1
+        run_eviction = _writes % EVICT_EVERY == 0
+    if run_eviction:
+        evict()
+    return sha
+
+
+def load_blob(sha):
+    with open(_blob_path(sha), "rb") as f:
+        return gzip.decompress(f.read()).decode("utf-8")
+
+
+def evict(ttl_days=PAGE_ARCHIVE_TTL_DAYS, max_mb=PAGE_ARCHIVE_MAX_MB):
+    """🧹 Rimuove le pagine oltre la TTL e, se serve, le più vecchie fino a rientrare nel limite."""
+    removed = 0
+    with _lock:
+        conn = _connect()
+        try:
+            conn.execute("DELETE FROM pages WHERE fetched_at < ?", (time.time() - ttl_days * 86400,))
+
+            max_bytes = max_mb * 1024 * 1024
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+            if total > max_bytes:
+                # Blob ordinati per ultimo utilizzo: si eliminano prima quelli meno recenti
+                rows = conn.execute("""
+                    SELECT b.sha256, b.size FROM blobs b
+                    LEFT JOIN pages p ON p.sha256 = b.sha256
+                    GROUP BY b.sha256, b.size
+                    ORDER BY COALESCE(MAX(p.fetched_at), 0)
+                """).fetchall()
+                for sha, size in rows:
+                    if total <= max_bytes:
+                        break
+                    conn.execute("DELETE FROM pages WHERE sha256 = ?", (sha,))
+                    total -= size
+
+            orphans = conn.execute("""
+                SELECT sha256 FROM blobs WHERE sha256 NOT IN (SELECT DISTINCT sha256 FROM pages)
+            """).fetchall()
+            for (sha,) in orphans:
+                try:
+                    os.remove(_blob_path(sha))
+                except FileNotFoundError:
+                    pass
+                conn.execute("DELETE FROM blobs WHERE sha256 = ?", (sha,))
+                removed += 1
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    if removed:
+        logger.info(f"🧹 Archivio pagine: rimossi {removed} contenuti.")
+    return removed
+
+
+def archive_stats():
+    """📊 Numero di pagine, contenuti unici e spazio occupato."""
+    with _lock:
+        conn = _connect()
+        pages = conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+        blobs, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs").fetchone()
+    return {"pages": pages, "unique_blobs": blobs, "size_mb": round(size / 1024 / 1024, 2)}
+
+
+def iter_archived_pages(since=None, url_contains=None, latest_only=True):
+    """🔁 Restituisce (url, fetched_at, search_type, html) dall'archivio, senza accesso alla rete."""
+    query = "SELECT url, MAX(fetched_at), sha256, search_type FROM pages" if latest_only else \
+        "SELECT url, fetched_at, sha256, search_type FROM pages"
+    conditions, params = [], []
+    if since:
+        conditions.append("fetched_at >= ?")
+        params.append(since)
+    if url_contains:
+        conditions.append("url LIKE ?")
+        params.append(f"%{url_contains}%")
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " GROUP BY url ORDER BY url" if latest_only else " ORDER BY fetched_at"
+
+    with _lock:
+        rows = _connect().execute(query, params).fetchall()
+    for url, fetched_at, sha, search_type in rows:
+        try:
+            yield url, fetched_at, search_type, load_blob(sha)
+        except FileNotFoundError:
+            logger.warning(f"⚠️ Contenuto mancante nell'archivio per {url}")
+
+
+def _query_from_url(url, search_type):
+    parsed = urlparse(url)
+    if search_type == "asin":
+        return parsed.path.rstrip("/").split("/")[-1]
+    return parse_qs(parsed.query).get("k", ["N/A"])[0]
+
+
+def replay(since=None, url_contains=None, save=False):
+    """▶️ Riesegue l'estrazione sulle pagine archiviate; con save=True aggiorna anche il database."""
+    from extractor import parse_html, is_blocked, search_results, extract_product
+
+    saver = None
+    if save:
+        from database import save_products_bulk
+        # Nessuna chiamata PA-API per i link mancanti: il replay non usa la rete
+        saver = partial(save_products_bulk, fetch_links=False)
+
+    pages = products = 0
+    for url, fetched_at, search_type, page_html in iter_archived_pages(since, url_contains):
+        doc = parse_html(page_html)
+        if is_blocked(doc):
+            continue
+        query = _query_from_url(url, search_type)
+        roots = [doc] if search_type == "asin" else search_results(doc)
+        pages += 1
+        extracted = [extract_product(root, query, search_type or "search") for root in roots]
+        products += len(extracted)
+        if saver:
+            # Datati all'ora del download (con fuso, come NOW() del database):
+            # una pagina vecchia non sovrascrive dati più recenti
+            observed_at = datetime.fromtimestamp(fetched_at, tz=timezone.utc)
+            saver([{**product, "observed_at": observed_at} for product in extracted])
+        yield from extracted
+    logger.info(f"✅ Replay completato: {pages} pagine, {products} prodotti estratti.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="📦 Archivio delle pagine scaricate")
+    sub = parser.add_subparsers(dest="command", required=True)
+    replay_parser = sub.add_parser("replay", help="Riesegue l'estrazione senza rete")
+    replay_parser.add_argument("--since-days", type=float, help="Solo pagine degli ultimi N giorni")
+    replay_parser.add_argument("--url-contains", help="Filtra le URL")
+    replay_parser.add_argument("--save", action="store_true", help="Salva i prodotti estratti nel database")
+    sub.add_parser("evict", help="Applica TTL e limite di spazio")
+    sub.add_parser("stats", help="Statistiche dell'archivio")
+    args = parser.parse_args()
+
+    if args.command == "replay":
+        since = time.time() - args.since_days * 86400 if args.since_days else None
+        for _ in replay(since, args.url_contains, args.save):
+            pass
+    elif args.command == "evict":
+        evict()
+    else:
+        logger.info(f"📊 Archivio pagine: {archive_stats()}")
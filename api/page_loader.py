@@ -0,0 +1,110 @@
+import logging
+import os
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+
+# ✅ Configurazione logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# 📌 Timeout del caricamento pagina (secondi)
+PAGE_LOAD_TIMEOUT = float(os.getenv("PAGE_LOAD_TIMEOUT", 20))
+READY_TIMEOUT = float(os.getenv("PAGE_READY_TIMEOUT", 10))
+RESULTS_STABLE_TIMEOUT = float(os.getenv("RESULTS_STABLE_TIMEOUT", 6))
+POLL_INTERVAL = 0.25
+
+# 📌 Selettori che indicano che la pagina è pronta
+COOKIE_BUTTON = (By.ID, "sp-cc-accept")
+SEARCH_RESULT_SELECTOR = "div.s-main-slot div[data-component-type='s-search-result']"
+PRODUCT_READY_SELECTOR = "#productTitle, #dp-container"
+BLOCKED_READY_SELECTOR = "form[action*='validateCaptcha']"
+
+
+def _ready_selector(search_type):
+    page_selector = PRODUCT_READY_SELECTOR if search_type == "asin" else SEARCH_RESULT_SELECTOR
+    return f"{page_selector}, {BLOCKED_READY_SELECTOR}"
+
+
+def accept_cookies(driver, search_type="search"):
+    """🍪 Aspetta il banner cookie oppure il contenuto della pagina, senza sleep fissi."""
+    ready_selector = _ready_selector(search_type)
+
+    def banner_or_content(d):
+        banner = d.find_elements(*COOKIE_BUTTON)
+        if banner:
+            return banner[0]
+        if d.find_elements(By.CSS_SELECTOR, ready_selector):
+            return "content"
+        return False
+
+    try:
+        found = WebDriverWait(driver, READY_TIMEOUT, poll_frequency=POLL_INTERVAL).until(banner_or_content)
+    except TimeoutException:
+        logger.warning("⚠️ Né banner cookie né contenuto trovati entro il timeout.")
+        return False
+
+    if found == "content":
+        # Il contenuto è già visibile: il banner, se arriva dopo, non blocca l'estrazione
+        if not driver.find_elements(*COOKIE_BUTTON):
+            logger.info("⚠️ Nessun banner cookie trovato.")
+            return False
+        found = driver.find_element(*COOKIE_BUTTON)
+
+    try:
+        WebDriverWait(driver, 2, poll_frequency=POLL_INTERVAL).until(EC.element_to_be_clickable(COOKIE_BUTTON))
+        found.click()
+        logger.info("✅ Banner cookie accettato.")
+        return True
+    except Exception as e:
+        logger.warning(f"⚠️ Impossibile accettare i cookie: {e}")
+        return False
+
+
+def wait_for_results(driver, timeout=READY_TIMEOUT):
+    """🔎 Aspetta che i nodi s-search-result siano presenti."""
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=POLL_INTERVAL).until(
+            EC.presence_of_element_located((By.CSS_SELECTOR, SEARCH_RESULT_SELECTOR))
+        )
+        return True
+    except TimeoutException:
+        logger.warning("⚠️ Nessun risultato di ricerca comparso entro il timeout.")
+        return False
+
+
+def wait_for_results_stable(driver, timeout=RESULTS_STABLE_TIMEOUT, stable_polls=3):
+    """📜 Scorre la pagina finché il numero di risultati smette di crescere."""
+    state = {"count": -1, "stable": 0}
+
+    def count_is_stable(d):
+        d.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+        count = len(d.find_elements(By.CSS_SELECTOR, SEARCH_RESULT_SELECTOR))
+        if count == state["count"]:
+            state["stable"] += 1
+        else:
+            state["count"], state["stable"] = count, 0
+        return state["stable"] >= stable_polls
+
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=POLL_INTERVAL).until(count_is_stable)
+        logger.info(f"✅ Risultati stabili: {state['count']}")
+    except TimeoutException:
+        logger.info(f"⚠️ Risultati ancora in crescita dopo {timeout}s, proseguo con {state['count']}.")
+    return state["count"]
+
+
+def load_page(driver, url, search_type="search"):
+    """🌐 Carica una pagina e attende solo le condizioni realmente necessarie."""
+    try:
+        driver.get(url)
+    except TimeoutException:
+        # Con la strategia 'eager' il DOM è già utilizzabile: interrompiamo le risorse lente
+        logger.warning(f"⚠️ Timeout di caricamento per {url}, interrompo le risorse rimanenti.")
+        driver.execute_script("window.stop();")
+
+    accept_cookies(driver, search_type)
+    if search_type != "asin" and wait_for_results(driver):
+        wait_for_results_stable(driver)
+    return driver.page_source
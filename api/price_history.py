@@ -0,0 +1,234 @@
+import logging
+import os
+import threading
+from datetime import date, datetime
+from db_pool import get_connection
+
+# ✅ Configurazione logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# 📌 Partizioni mensili create in anticipo rispetto al mese corrente
+PRICE_HISTORY_MONTHS_AHEAD = int(os.getenv("PRICE_HISTORY_MONTHS_AHEAD", 2))
+
+# 📌 Finestre (in giorni) delle medie mobili salvate in price_history
+ROLLING_WINDOWS = (7, 14, 30, 60, 90)
+
+# Mesi la cui partizione è già stata creata da questo processo (niente DDL a ogni scrittura)
+_ready_months = set()
+_ready_lock = threading.Lock()
+
+
+def _month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"price_history_y{month.year}m{month.month:02d}"
+
+
+def create_price_history(cur):
+    """🛠️ Tabella price_history partizionata per mese su scraped_at, in sola aggiunta."""
+    _migrate_legacy_table(cur)
+    _create_partitioned_table(cur)
+    _create_daily_stats(cur)
+
+
+def _create_partitioned_table(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS price_history (
+            asin TEXT NOT NULL,
+            price FLOAT,
+            old_price FLOAT,
+            discount FLOAT,
+            availability TEXT,
+            rating FLOAT,
+            reviews INT,
+            price_diff FLOAT,
+            rolling_avg_7 FLOAT,
+            rolling_avg_14 FLOAT,
+            rolling_avg_30 FLOAT,
+            rolling_avg_60 FLOAT,
+            rolling_avg_90 FLOAT,
+            scraped_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        ) PARTITION BY RANGE (scraped_at);
+        ALTER TABLE price_history ADD COLUMN IF NOT EXISTS rolling_avg_60 FLOAT;
+        ALTER TABLE price_history ADD COLUMN IF NOT EXISTS rolling_avg_90 FLOAT;
+
+        -- BRIN: minuscolo e ideale per dati inseriti in ordine di tempo
+        CREATE INDEX IF NOT EXISTS idx_price_history_scraped_at_brin ON price_history USING BRIN (scraped_at);
+        CREATE INDEX IF NOT EXISTS idx_price_history_asin_scraped_at ON price_history (asin, scraped_at);
+    """)
+    current = _month_start(datetime.now())
+    ensure_partitions(cur, current, _add_months(current, PRICE_HISTORY_MONTHS_AHEAD))
+
+
+def _create_daily_stats(cur):
+    """
+    📊 Stato per ASIN e giorno (somma, conteggio, ultimo prezzo) da cui si calcolano
+    medie mobili e price_diff al momento dell'inserimento, leggendo al più 90 righe per ASIN.
+    """
+    cur.execute("SELECT to_regclass('price_daily_stats') IS NULL")
+    missing = cur.fetchone()[0]
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS price_daily_stats (
+            asin TEXT NOT NULL,
+            day DATE NOT NULL,
+            price_sum FLOAT NOT NULL,
+            price_count INT NOT NULL,
+            last_price FLOAT NOT NULL,
+            last_seen_at TIMESTAMP NOT NULL,
+            PRIMARY KEY (asin, day)
+        );
+    """)
+    if missing:
+        # Prima creazione: lo stato viene ricostruito una volta dallo storico esistente
+        cur.execute("""
+            INSERT INTO price_daily_stats (asin, day, price_sum, price_count, last_price, last_seen_at)
+            SELECT asin, scraped_at::date, SUM(price), COUNT(*),
+                   (ARRAY_AGG(price ORDER BY scraped_at DESC))[1], MAX(scraped_at)
+            FROM price_history
+            WHERE price IS NOT NULL
+            GROUP BY asin, scraped_at::date;
+        """)
+    # Oltre la finestra più lunga serve solo l'ultimo giorno di ogni ASIN (per price_diff)
+    cur.execute("""
+        DELETE FROM price_daily_stats d
+        WHERE d.day < CURRENT_DATE - %s
+          AND EXISTS (SELECT 1 FROM price_daily_stats n WHERE n.asin = d.asin AND n.day > d.day);
+    """, (max(ROLLING_WINDOWS),))
+
+
+def ensure_partitions(cur, first_month, last_month):
+    """📅 Crea le partizioni mensili mancanti da first_month a last_month inclusi."""
+    month = _month_start(first_month)
+    last_month = _month_start(last_month)
+    while month <= last_month:
+        cur.execute(f"""
+            CREATE TABLE IF NOT EXISTS {partition_name(month)}
+            PARTITION OF price_history
+            FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}');
+        """)
+        month = _add_months(month, 1)
+
+
+def ensure_current_partition():
+    """
+    📅 Garantisce la partizione del mese corrente prima di una scrittura.
+    Usa una transazione propria, così la partizione resta anche se il salvataggio fallisce;
+    dopo la prima volta il controllo è solo in memoria.
+    """
+    month = _month_start(datetime.now())
+    with _ready_lock:
+        if month in _ready_months:
+            return
+    with get_connection() as conn:
+        if not conn:
+            return
+        try:
+            with conn.cursor() as cur:
+                ensure_partitions(cur, month, _add_months(month, PRICE_HISTORY_MONTHS_AHEAD))
+            conn.commit()
+        except Exception as e:
+            logger.error(f"❌ Errore nella creazione delle partizioni di price_history: {e}")
+            return
+    with _ready_lock:
+        _ready_months.add(month)
+
+
+def record_observations(cur, changed_asins, seen_asins=None):
+    """
+    📈 Aggiunge a price_history lo stato attuale degli ASIN con prezzo o disponibilità cambiati,
+    con price_diff e medie mobili a 7/14/30/60/90 giorni calcolate dallo stato giornaliero
+    (inclusa l'osservazione corrente). Lo stato giornaliero riceve tutti gli ASIN osservati.
+    Va chiamata nella stessa transazione dell'upsert su product_prices, dopo ensure_current_partition().
+    """
+    seen_asins = changed_asins if seen_asins is None else seen_asins
+    if not changed_asins:
+        _update_daily_stats(cur, seen_asins)
+        return 0
+    averages = ",\n".join(
+        f"""               (COALESCE(s.sum_{n}, 0) + pp.price) / (COALESCE(s.count_{n}, 0) + 1)"""
+        for n in ROLLING_WINDOWS
+    )
+    windows = ",\n".join(
+        f"""                   SUM(price_sum) FILTER (WHERE day > pp.scraped_at::date - {n}) AS sum_{n},
+                   SUM(price_count) FILTER (WHERE day > pp.scraped_at::date - {n}) AS count_{n}"""
+        for n in ROLLING_WINDOWS
+    )
+    cur.execute(f"""
+        INSERT INTO price_history (asin, price, old_price, discount, availability, rating, reviews,
+                                   price_diff, {", ".join(f"rolling_avg_{n}" for n in ROLLING_WINDOWS)}, scraped_at)
+        SELECT pp.asin, pp.price, pp.old_price, pp.discount, pp.availability, pp.rating, pp.reviews,
+               pp.price - last.last_price,
+{averages},
+               pp.scraped_at
+        FROM product_prices pp
+        LEFT JOIN LATERAL (
+            SELECT last_price FROM price_daily_stats
+            WHERE asin = pp.asin ORDER BY day DESC LIMIT 1
+        ) last ON TRUE
+        LEFT JOIN LATERAL (
+            SELECT
+{windows}
+            FROM price_daily_stats
+            WHERE asin = pp.asin AND day > pp.scraped_at::date - {max(ROLLING_WINDOWS)}
+        ) s ON TRUE
+        WHERE pp.asin = ANY(%s);
+    """, (list(changed_asins),))
+    recorded = cur.rowcount
+    _update_daily_stats(cur, seen_asins)
+    return recorded
+
+
+def _update_daily_stats(cur, asins):
+    """🔁 Aggiorna lo stato giornaliero con il prezzo appena osservato."""
+    if not asins:
+        return
+    cur.execute("""
+        INSERT INTO price_daily_stats (asin, day, price_sum, price_count, last_price, last_seen_at)
+        SELECT asin, COALESCE(last_seen_at, scraped_at)::date, price, 1, price, COALESCE(last_seen_at, scraped_at)
+        FROM product_prices
+        WHERE asin = ANY(%s) AND price IS NOT NULL
+        ON CONFLICT (asin, day) DO UPDATE
+        SET price_sum = price_daily_stats.price_sum + EXCLUDED.price_sum,
+            price_count = price_daily_stats.price_count + 1,
+            last_price = EXCLUDED.last_price,
+            last_seen_at = EXCLUDED.last_seen_at;
+    """, (list(asins),))
+
+
+def _migrate_legacy_table(cur):
+    """🔁 Converte una price_history non partizionata (creata a mano) nella versione partizionata."""
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('price_history')")
+    row = cur.fetchone()
+    if not row or row[0] != "r":
+        return
+
+    logger.info("🔁 price_history non partizionata: migrazione in corso...")
+    cur.execute("ALTER TABLE price_history RENAME TO price_history_legacy")
+    for index in ("idx_price_history_scraped_at_brin", "idx_price_history_asin_scraped_at"):
+        cur.execute(f"DROP INDEX IF EXISTS {index}")
+    cur.execute("SELECT column_name FROM information_schema.columns WHERE table_name = 'price_history_legacy'")
+    legacy_columns = {r[0] for r in cur.fetchall()}
+    cur.execute("SELECT MIN(scraped_at), MAX(scraped_at) FROM price_history_legacy")
+    first, last = cur.fetchone()
+
+    _create_partitioned_table(cur)
+    if first is None:
+        return
+    ensure_partitions(cur, first, last)
+    columns = ", ".join(c for c in ("asin", "price", "old_price", "discount", "availability", "rating", "reviews",
+                                    "price_diff", "rolling_avg_7", "rolling_avg_14", "rolling_avg_30",
+                                    "rolling_avg_60", "rolling_avg_90", "scraped_at")
+                        if c in legacy_columns)
+    cur.execute(f"""
+        INSERT INTO price_history ({columns})
+        SELECT {columns} FROM price_history_legacy WHERE scraped_at IS NOT NULL AND asin IS NOT NULL;
+    """)
+    logger.info(f"✅ Migrate {cur.rowcount} righe in price_history; l'originale resta in price_history_legacy.")
@@ -0,0 +1,276 @@
+import base64
+import json
+import re
+from datetime import datetime
+
+# 📌 Limiti dei risultati della ricerca
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+
+# 📌 Paginazione di /api/prodotti
+PAGE_DEFAULT_SIZE = 50
+PAGE_MAX_SIZE = 200
+
+# 📌 ASIN massimi per richiesta in /api/prodotti/batch
+BATCH_MAX_ASINS = 200
+
+# Campi restituibili con fields= (nome JSON -> colonna)
+PRODUCT_FIELDS = ("asin", "name", "price", "old_price", "discount", "description", "rating",
+                  "reviews", "availability", "image_url", "affiliate_link", "category")
+
+
+
+# Campi restituiti dalla ricerca full-text
+SEARCH_FIELDS = ("asin", "name", "price", "old_price", "discount", "rating", "reviews",
+                 "availability", "image_url", "affiliate_link", "category")
+
+# Colonne dell'ultimo punto di price_history incluso con history=true
+HISTORY_FIELDS = ("price", "old_price", "discount", "availability", "rating", "reviews", "price_diff", "scraped_at")
+
+# Ordinamenti ammessi: i NULL diventano 0 (o '') così l'ordine è totale e la paginazione a chiave funziona
+SORT_EXPRESSIONS = {
+    "asin": "asin",
+    "name": "COALESCE(name, '')",
+    "price": "COALESCE(price, 0)",
+    "discount": "COALESCE(discount, 0)",
+    "rating": "COALESCE(rating, 0)",
+    "reviews": "COALESCE(reviews, 0)",
+    "scraped_at": "COALESCE(scraped_at, 'epoch'::timestamp)",
+}
+
+# Tipi JSON ammessi nel cursore per ogni ordinamento (mai null: le espressioni sono tutte COALESCE)
+CURSOR_TYPES = {
+    "asin": str,
+    "name": str,
+    "price": (int, float),
+    "discount": (int, float),
+    "rating": (int, float),
+    "reviews": int,
+    "scraped_at": str,
+}
+
+CATEGORIES_QUERY = "SELECT DISTINCT category FROM product_prices;"
+
+# Query SQL condivise dal server sincrono (Flask + psycopg2) e da quello asincrono (Quart + asyncpg):
+# i parametri sono sempre %s posizionali, convertiti in $1, $2, ... per asyncpg.
+
+
+def product_filters(category=None, min_discount=None, min_price=None, max_price=None,
+                    min_rating=None, availability=None):
+    """🧮 Condizioni SQL (e parametri) per i filtri dei prodotti"""
+    conditions, params = [], []
+    if category:
+        conditions.append("category_key = regexp_replace(lower(btrim(%s)), '\\s+', ' ', 'g')")
+        params.append(category)
+    if min_discount:
+        conditions.append("discount >= %s")
+        params.append(min_discount)
+    if min_price is not None:
+        conditions.append("price >= %s")
+        params.append(min_price)
+    if max_price is not None:
+        conditions.append("price <= %s")
+        params.append(max_price)
+    if min_rating is not None:
+        conditions.append("rating >= %s")
+        params.append(min_rating)
+    if availability:
+        conditions.append("availability ILIKE %s")
+        params.append(f"%{like_escape(availability)}%")
+    return conditions, params
+
+
+def like_escape(text):
+    """🛡️ Testo letterale in un pattern LIKE/ILIKE: %, _ e \\ (carattere di escape predefinito) vengono protetti."""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def prefix_tsquery(text, every_word=False):
+    """
+    🔤 tsquery 'simple' in cui ogni parola deve comparire: l'ultima (o tutte, con every_word)
+    anche come prefisso ("lapt" -> "laptop", "smartphone" -> "smartphones"). None se non ci sono parole.
+    """
+    words = re.findall(r"\w+", text.lower())
+    if not words:
+        return None
+    if every_word:
+        return " & ".join(f"{word}:*" for word in words)
+    return " & ".join(words[:-1] + [f"{words[-1]}:*"])
+
+
+def encode_cursor(sort_value, asin):
+    """🔖 Cursore opaco: ultimo valore di ordinamento e ASIN della pagina"""
+    payload = json.dumps([sort_value, asin], default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii")
+
+
+def decode_cursor(cursor, sort="asin"):
+    """🔖 Legge un cursore di encode_cursor; solleva ValueError se forma o tipi non corrispondono all'ordinamento."""
+    payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    if not isinstance(payload, list) or len(payload) != 2:
+        raise ValueError("Cursore non valido")
+    sort_value, asin = payload
+    if not isinstance(asin, str) or not isinstance(sort_value, CURSOR_TYPES[sort]) or isinstance(sort_value, bool):
+        raise ValueError("Cursore non valido")
+    if sort == "scraped_at":
+        # asyncpg vuole un datetime per i parametri TIMESTAMP, non la stringa del cursore
+        sort_value = datetime.fromisoformat(sort_value)
+    return sort_value, asin
+
+
+def parse_fields(value):
+    """🧾 Proiezione fields= ("asin,name,price" o lista); tutti i campi se assente. Solleva ValueError."""
+    if not value:
+        return PRODUCT_FIELDS
+    if isinstance(value, str):
+        value = value.split(',')
+    fields = tuple(f for f in value if f)
+    unknown = [str(f) for f in fields if f not in PRODUCT_FIELDS]
+    if unknown or not fields:
+        raise ValueError(f"Campi non validi: {', '.join(unknown)}")
+    return fields
+
+
+def parse_page_args(args):
+    """
+    📥 Legge gli argomenti di /api/prodotti (filtri, sort, fields, cursor, limit) da un MultiDict
+    di Flask o Quart. Ritorna i parametri di page_query() o solleva ValueError con il messaggio per il 400.
+    """
+    conditions, params = product_filters(
+        category=args.get('category'),
+        min_discount=args.get('discount', type=int),
+        min_price=args.get('min_price', type=float),
+        max_price=args.get('max_price', type=float),
+        min_rating=args.get('min_rating', type=float),
+        availability=args.get('availability'),
+    )
+
+    sort = args.get('sort', 'asin')
+    descending = sort.startswith('-')
+    sort = sort.lstrip('-')
+    if sort not in SORT_EXPRESSIONS:
+        raise ValueError(f"Ordinamento non valido: {sort}")
+
+    fields = parse_fields(args.get('fields'))
+
+    after = None
+    if args.get('cursor'):
+        try:
+            after = decode_cursor(args['cursor'], sort)
+        except Exception:
+            raise ValueError("Cursore non valido")
+
+    limit = max(1, min(args.get('limit', PAGE_DEFAULT_SIZE, type=int), PAGE_MAX_SIZE))
+    return {"conditions": conditions, "params": params, "sort": sort, "descending": descending,
+            "after": after, "limit": limit, "fields": fields}
+
+
+def page_query(conditions, params, sort="asin", descending=False, after=None,
+               limit=PAGE_DEFAULT_SIZE, fields=PRODUCT_FIELDS):
+    """
+    📄 Query di una pagina con paginazione a chiave (keyset): WHERE (ordinamento, asin) > cursore.
+    Il costo non dipende dalla posizione della pagina, a differenza di OFFSET.
+    Chiede una riga in più per sapere se esiste una pagina successiva (vedi split_page).
+    """
+    sort_expr = SORT_EXPRESSIONS[sort]
+    conditions, params = list(conditions), list(params)
+    if after is not None:
+        conditions.append(f"({sort_expr}, asin) {'<' if descending else '>'} (%s, %s)")
+        params.extend(after)
+    direction = "DESC" if descending else "ASC"
+    query = f"""
+        SELECT {", ".join(fields)}, asin AS _asin, {sort_expr} AS _sort
+        FROM product_prices
+        {"WHERE " + " AND ".join(conditions) if conditions else ""}
+        ORDER BY {sort_expr} {direction}, asin {direction}
+        LIMIT %s;
+    """
+    params.append(limit + 1)
+    return query, params
+
+
+def split_page(rows, limit, fields):
+    """✂️ Righe di page_query() -> (prodotti, cursore della pagina successiva o None)."""
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][-1], rows[-1][-2])
+    return [dict(zip(fields, row)) for row in rows], next_cursor
+
+
+def search_query(text, category=None, limit=SEARCH_DEFAULT_LIMIT):
+    """
+    🔎 Ricerca full-text su nome e categoria (indice GIN), con completamento dell'ultima parola.
+    Ritorna (query, parametri), oppure None se il testo non contiene parole.
+    """
+    tsquery = prefix_tsquery(text)
+    if not tsquery:
+        return None
+    query = f"""
+        SELECT {", ".join(SEARCH_FIELDS)}
+        FROM product_prices, to_tsquery('simple', %s) AS query
+        WHERE search_vector @@ query
+          AND (%s::text IS NULL
+               OR category_key = regexp_replace(lower(btrim(%s::text)), '\\s+', ' ', 'g'))
+        ORDER BY ts_rank(search_vector, query) DESC, asin
+        LIMIT %s;
+    """
+    return query, [tsquery, category, category, limit]
+
+
+def search_limit(args):
+    return max(1, min(args.get('limit', SEARCH_DEFAULT_LIMIT, type=int), SEARCH_MAX_LIMIT))
+
+
+def parse_batch_body(body):
+    """
+    📥 Legge il corpo JSON di POST /api/prodotti/batch:
+    {"asins": ["B0...", ...], "history": true, "fields": "asin,name,price"}.
+    Ritorna i parametri di batch_query() o solleva ValueError con il messaggio per il 400.
+    """
+    if not isinstance(body, dict):
+        raise ValueError("Corpo JSON non valido: atteso un oggetto con 'asins'")
+    asins = body.get("asins")
+    if not isinstance(asins, list) or not all(isinstance(a, str) and a for a in asins):
+        raise ValueError("'asins' deve essere una lista di stringhe")
+    # Duplicati rimossi mantenendo l'ordine della richiesta
+    asins = list(dict.fromkeys(a.strip() for a in asins))
+    if len(asins) > BATCH_MAX_ASINS:
+        raise ValueError(f"Troppi ASIN: massimo {BATCH_MAX_ASINS} per richiesta")
+    return {"asins": asins, "fields": parse_fields(body.get("fields")), "history": bool(body.get("history"))}
+
+
+def batch_query(asins, fields=PRODUCT_FIELDS, history=False):
+    """
+    📦 Prodotti per lista di ASIN in una sola query (asin = ANY, indice della chiave primaria),
+    con l'ultimo punto di price_history per ASIN se history è vero (indice su asin, scraped_at).
+    """
+    columns = [f"p.{f}" for f in fields] + ["p.asin AS _asin"]
+    join = ""
+    if history:
+        columns += [f"h.{f} AS _h_{f}" for f in HISTORY_FIELDS]
+        join = f"""
+        LEFT JOIN LATERAL (
+            SELECT {", ".join(HISTORY_FIELDS)} FROM price_history
+            WHERE asin = p.asin ORDER BY scraped_at DESC LIMIT 1
+        ) h ON TRUE"""
+    query = f"""
+        SELECT {", ".join(columns)}
+        FROM product_prices p{join}
+        WHERE p.asin = ANY(%s);
+    """
+    return query, [list(asins)]
+
+
+def split_batch(rows, asins, fields=PRODUCT_FIELDS, history=False):
+    """✂️ Righe di batch_query() -> prodotti nell'ordine degli ASIN richiesti (i mancanti sono omessi)."""
+    width = len(fields)
+    found = {}
+    for row in rows:
+        row = tuple(row)
+        product = dict(zip(fields, row[:width]))
+        if history:
+            point = dict(zip(HISTORY_FIELDS, row[width + 1:]))
+            product["latest_history"] = point if point["scraped_at"] is not None else None
+        found[row[width]] = product
+    return [found[asin] for asin in asins if asin in found]
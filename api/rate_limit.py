@@ -0,0 +1,163 @@
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# 📌 Cortesia verso i siti: richieste al secondo e burst massimo per host
+HOST_RATE = float(os.getenv("HOST_RATE", 0.5))
+HOST_BURST = int(os.getenv("HOST_BURST", 2))
+
+
+class TokenBucket:
+    """🪣 Token bucket thread-safe: `rate` token al secondo, fino a `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, tokens=1):
+        """📅 Prenota i token e restituisce quanti secondi attendere prima di usarli."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self, tokens=1):
+        """⏳ Blocca finché i token sono disponibili. Ritorna il tempo atteso."""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+class HostRateLimiter:
+    """🌐 Un token bucket per ogni host, creato al primo utilizzo."""
+
+    def __init__(self, rate=HOST_RATE, capacity=HOST_BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, host):
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(self.rate, self.capacity)
+            return self._buckets[host]
+
+    def acquire(self, url):
+        return self.bucket(urlparse(url).netloc).acquire()
+
+
+_host_limiter = HostRateLimiter()
+
+
+def get_host_limiter():
+    """🔁 Limiter per host condiviso dal processo."""
+    return _host_limiter
+
+
+# 📌 Quota PA-API: richieste al secondo (TPS) e al giorno (TPD)
+PAAPI_TPS = float(os.getenv("PAAPI_TPS", 1))
+PAAPI_TPD = int(os.getenv("PAAPI_TPD", 8640))
+PAAPI_LIMITER_STATE = os.getenv("PAAPI_LIMITER_STATE", os.path.join(tempfile.gettempdir(), "dati_bot_paapi_limiter.json"))
+
+
+class QuotaExhausted(Exception):
+    """🚫 Quota giornaliera PA-API esaurita."""
+
+
+class SharedRateLimiter:
+    """
+    🤝 Limiter PA-API condiviso tra thread e processi.
+    Ogni chiamata prenota il proprio slot nel file di stato (protetto da lock) e attende
+    fino a quel momento: le richieste sono distribuite in anticipo invece di reagire ai 429.
+    """
+
+    def __init__(self, tps=PAAPI_TPS, tpd=PAAPI_TPD, state_path=PAAPI_LIMITER_STATE):
+        self.tps = tps
+        self.tpd = tpd
+        self.state_path = state_path
+        self._lock = threading.Lock()
+        # Senza fcntl (Windows) il limite vale solo all'interno del processo
+        self._state = {"next_slot": 0.0, "day": None, "used": 0}
+
+    @contextmanager
+    def _locked_state(self):
+        with self._lock:
+            if fcntl is None:
+                yield self._state
+                return
+            with open(self.state_path, "a+") as f:
+                fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    f.seek(0)
+                    raw = f.read()
+                    state = json.loads(raw) if raw else {"next_slot": 0.0, "day": None, "used": 0}
+                    yield state
+                    f.seek(0)
+                    f.truncate()
+                    f.write(json.dumps(state))
+                    f.flush()
+                finally:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+
+    def reserve(self):
+        """📅 Prenota il prossimo slot libero e restituisce i secondi di attesa."""
+        now = time.time()
+        today = time.strftime("%Y-%m-%d", time.gmtime(now))
+        with self._locked_state() as state:
+            if state["day"] != today:
+                state["day"], state["used"] = today, 0
+            if state["used"] >= self.tpd:
+                raise QuotaExhausted(f"Quota PA-API giornaliera esaurita ({self.tpd} richieste)")
+            slot = max(now, state["next_slot"])
+            state["next_slot"] = slot + 1.0 / self.tps
+            state["used"] += 1
+        return slot - now
+
+    def acquire(self):
+        """⏳ Attende il proprio slot prima di chiamare PA-API. Ritorna il tempo atteso."""
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def usage(self):
+        """📊 Quota giornaliera usata e residua."""
+        today = time.strftime("%Y-%m-%d", time.gmtime())
+        with self._locked_state() as state:
+            used = state["used"] if state["day"] == today else 0
+        return {
+            "tps": self.tps,
+            "tpd": self.tpd,
+            "used_today": used,
+            "remaining_today": max(self.tpd - used, 0),
+            "quota_used_pct": round(100.0 * used / self.tpd, 2) if self.tpd else 0.0,
+        }
+
+
+_paapi_limiter = SharedRateLimiter()
+
+
+def get_paapi_limiter():
+    """🔁 Limiter PA-API condiviso: ogni chiamata a Amazon PA-API passa da qui."""
+    return _paapi_limiter
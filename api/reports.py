@@ -5,37 +5,42 @@ from datetime import datetime
 
 # Import dinamico per evitare errori
 try:
-    from api.database import get_all_products
+    from database import get_all_products  # Stesso modulo usato dagli altri file in api/
 except ImportError:
-    from database import get_all_products
+    from api.database import get_all_products
 
 # Configurazione del logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+REPORT_COLUMNS = ["ASIN", "Nome", "Prezzo", "Vecchio Prezzo", "Sconto", "Rating", "Recensioni", "URL", "Immagine"]
+
 def generate_report(output_dir="data/reports"):
     """
     📊 Genera un report in formato CSV con tutti i prodotti nel database.
+    I prodotti arrivano a blocchi da un cursore lato server: la memoria non cresce con il catalogo.
     """
     try:
-        # Recupera i dati dal database
-        products = get_all_products()
-
-        if not products:
-            logger.warning("⚠️ Nessun prodotto trovato nel database. Report non generato.")
-            return None
-
         # Creazione della directory per i report se non esiste
         os.makedirs(output_dir, exist_ok=True)
 
         # Nome del file report
         report_filename = f"{output_dir}/report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
 
-        # Creazione del DataFrame e salvataggio
-        df = pd.DataFrame(products, columns=["ASIN", "Nome", "Prezzo", "Vecchio Prezzo", "Sconto", "Rating", "Recensioni", "URL", "Immagine"])
-        df.to_csv(report_filename, index=False, encoding="utf-8")
+        # Scrittura a blocchi: intestazione solo con il primo
+        rows_written = 0
+        with open(report_filename, "w", encoding="utf-8", newline="") as report_file:
+            for products in get_all_products():
+                df = pd.DataFrame(products, columns=REPORT_COLUMNS)
+                df.to_csv(report_file, index=False, header=rows_written == 0)
+                rows_written += len(df)
+
+        if not rows_written:
+            os.remove(report_filename)
+            logger.warning("⚠️ Nessun prodotto trovato nel database. Report non generato.")
+            return None
 
-        logger.info(f"✅ Report generato con successo: {report_filename}")
+        logger.info(f"✅ Report generato con successo: {report_filename} ({rows_written} prodotti)")
         return report_filename
 
     except Exception as e:
@@ -0,0 +1,168 @@
+import hashlib
+import logging
+import os
+import select
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+import psycopg2
+from flask import Response, request
+from db_pool import DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT
+from data_generation import DATA_CHANGED_CHANNEL
+
+# ✅ Configurazione logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# 📌 Configurazione cache delle risposte
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 1000))
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "1") == "1"
+
+
+class GenerationListener:
+    """
+    👂 Thread in ascolto su LISTEN data_changed con una connessione dedicata (fuori dal pool).
+    Finché l'ascolto non è attivo la generazione è None e la cache viene ignorata.
+    """
+
+    def __init__(self, channel=DATA_CHANGED_CHANNEL):
+        self.channel = channel
+        self.generation = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="response-cache-listener", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        backoff = 1
+        while True:
+            try:
+                self._listen()
+            except Exception as e:
+                logger.warning(f"⚠️ Ascolto di {self.channel} interrotto: {e}. Nuovo tentativo tra {backoff}s.")
+            # Senza ascolto non sappiamo se i dati sono cambiati: cache sospesa
+            self.generation = None
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 60)
+
+    def _listen(self):
+        conn = psycopg2.connect(dbname=DB_NAME, user=DB_USER, password=DB_PASSWORD, host=DB_HOST, port=DB_PORT)
+        try:
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cur:
+                cur.execute(f"LISTEN {self.channel}")
+                # Letta dopo LISTEN: nessuna notifica può andare persa tra le due operazioni
+                cur.execute("SELECT generation FROM data_generation WHERE id = 1")
+                row = cur.fetchone()
+            self.generation = row[0] if row else 0
+            logger.info(f"👂 Cache risposte attiva (generazione {self.generation}).")
+            while True:
+                if select.select([conn], [], [], 60) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    self.generation = max(self.generation or 0, int(notify.payload or 0))
+        finally:
+            conn.close()
+
+
+class ResponseCache:
+    """
+    🗄️ Cache LRU delle risposte per route + argomenti normalizzati, con ETag / If-None-Match.
+    Ogni voce ricorda la generazione dei dati con cui è stata prodotta: una scrittura la rende obsoleta.
+    """
+
+    def __init__(self, size=RESPONSE_CACHE_SIZE, listener=None):
+        self.size = size
+        self.listener = listener or GenerationListener()
+        self._entries = OrderedDict()  # chiave -> (generazione, etag, body, status, headers)
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "not_modified": 0, "bypassed": 0, "bytes_saved": 0}
+
+    @staticmethod
+    def _key():
+        args = tuple(sorted((k, v) for k, values in request.args.lists() for v in values))
+        return request.path, args
+
+    def _lookup(self, key, generation):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == generation:
+                self._entries.move_to_end(key)
+                return entry
+            return None
+
+    def _store(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+            # Le voci di generazioni precedenti non verranno più servite
+            stale = [k for k, e in self._entries.items() if e[0] != entry[0]]
+            for k in stale:
+                del self._entries[k]
+
+    def _count(self, name, saved=0):
+        with self._lock:
+            self.stats[name] += 1
+            self.stats["bytes_saved"] += saved
+
+    @staticmethod
+    def _respond(entry):
+        _, etag, body, status, headers = entry
+        if request.if_none_match.contains_weak(etag):
+            return Response(status=304, headers={"ETag": f'"{etag}"'})
+        response = Response(body, status=status, headers=headers)
+        response.set_etag(etag)
+        return response
+
+    def cached(self, view):
+        """🎯 Decoratore per le route GET da mettere in cache."""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            self.listener.start()
+            generation = self.listener.generation
+            if not RESPONSE_CACHE_ENABLED or generation is None:
+                self._count("bypassed")
+                return view(*args, **kwargs)
+
+            key = self._key()
+            entry = self._lookup(key, generation)
+            if entry:
+                not_modified = request.if_none_match.contains_weak(entry[1])
+                # Risparmiati la query e, con 304, anche l'invio del corpo
+                self._count("not_modified" if not_modified else "hits", len(entry[2]))
+                return self._respond(entry)
+
+            self._count("misses")
+            response = view(*args, **kwargs)
+            if isinstance(response, tuple) or response.status_code != 200:
+                return response
+            body = response.get_data()
+            etag = hashlib.sha1(body).hexdigest()
+            headers = [(k, v) for k, v in response.headers.items() if k.lower() not in ("content-length", "etag")]
+            entry = (generation, etag, body, response.status_code, headers)
+            self._store(key, entry)
+            return self._respond(entry)
+        return wrapper
+
+    def report(self):
+        """📊 Hit ratio e byte risparmiati."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self._entries)
+        served = stats["hits"] + stats["not_modified"]
+        total = served + stats["misses"]
+        stats["hit_ratio"] = round(served / total, 3) if total else 0.0
+        stats["generation"] = self.listener.generation
+        return stats
+
+
+response_cache = ResponseCache()
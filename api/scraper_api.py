@@ -1,11 +1,10 @@
 import logging
 import json
 import os
-import time
-from amazon_paapi import AmazonApi
 from dotenv import load_dotenv
-from database import save_product_data  # ✅ Usa la funzione aggiornata per salvare i prodotti
-from utils import get_affiliate_link  # ✅ Mantiene il recupero del link affiliato
+from database import save_products_bulk  # ✅ Salvataggio in blocco con COPY
+from utils import get_affiliate_link, resolve_many  # ✅ Link affiliati recuperati in batch da 10
+from paapi_client import get_client, run_sync  # ✅ Client PA-API asincrono con firma SigV4
 
 # ✅ Caricamento variabili d'ambiente
 load_dotenv()
@@ -13,29 +12,26 @@ load_dotenv()
 AWS_ACCESS_KEY = os.getenv("AWS_ACCESS_KEY")
 AWS_SECRET_KEY = os.getenv("AWS_SECRET_KEY")
 AWS_ASSOCIATE_TAG = os.getenv("AWS_ASSOCIATE_TAG")
-AWS_REGION = "IT"  # ✅ Amazon Italia
 
 # ✅ Configurazione logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
-# ✅ Funzione per formattare i dati ricevuti
+# ✅ Funzione per formattare i dati ricevuti (Item tipizzato di paapi_client)
 def format_data(item):
-    try:
-        return {
-            "ASIN": getattr(item, "asin", "N/A"),
-            "Titolo": getattr(item.item_info.title, "display_value", "N/A") if hasattr(item, "item_info") and hasattr(item.item_info, "title") else "N/A",
-            "Prezzo": getattr(item.offers.listings[0].price, "display_amount", "N/A") if hasattr(item, "offers") and item.offers and hasattr(item.offers.listings[0], "price") else "N/A",
-            "Stock": getattr(item.offers.listings[0].availability, "message", "N/A") if hasattr(item, "offers") and item.offers and hasattr(item.offers.listings[0], "availability") else "N/A",
-            "Recensioni": getattr(item.customer_reviews, "count", "N/A") if hasattr(item, "customer_reviews") else "N/A",
-            "Rating": getattr(item.customer_reviews, "star_rating", "N/A") if hasattr(item, "customer_reviews") else "N/A",
-            "URL": getattr(item, "detail_page_url", "N/A"),
-            "Immagine": getattr(item.images.primary.large, "url", "N/A") if hasattr(item, "images") and hasattr(item.images.primary, "large") else "N/A",
-            "offer_text": getattr(item.offers.listings[0], "violator", {}).get("text", None) if hasattr(item, "offers") and item.offers and hasattr(item.offers.listings[0], "violator") else None
-        }
-    except Exception as e:
-        logger.error(f"❌ Errore nel formattare i dati: {e}")
-        return {}
+    return {
+        "ASIN": item.asin or "N/A",
+        "Titolo": item.title or "N/A",
+        "Prezzo": item.price,
+        "Vecchio Prezzo": item.old_price,
+        "Sconto": item.discount,
+        "Stock": item.availability or "N/A",
+        "Recensioni": item.reviews,
+        "Rating": item.rating,
+        "URL": item.url or "N/A",
+        "Immagine": item.image or "N/A",
+        "offer_text": item.offer_text
+    }
 
 # ✅ Funzione per ottenere dati di un prodotto dall'API Amazon
 def get_product_data_from_api(asin_list):
@@ -44,21 +40,20 @@ def get_product_data_from_api(asin_list):
             logger.error("❌ Credenziali API mancanti! Verifica il file .env")
             return None
 
-        logger.info(f"🔄 Inizializzazione connessione a PA-API 5 per {asin_list}...")
-        api = AmazonApi(AWS_ACCESS_KEY, AWS_SECRET_KEY, AWS_ASSOCIATE_TAG, AWS_REGION)
-        response = api.get_items(items=asin_list)
+        logger.info(f"🔄 Richiesta a PA-API 5 per {asin_list}...")
+        items = run_sync(get_client().get_items(asin_list))
 
-        if response:
+        if items:
             logger.info("✅ Risposta ricevuta con successo!")
 
             formatted_results = []
-            for item in response.items:
+            for item in items:
                 formatted_data = format_data(item)
                 if formatted_data["ASIN"] != "N/A":
                     formatted_results.append(formatted_data)
                     logger.info(f"📊 Dati formattati per ASIN {formatted_data['ASIN']}: {json.dumps(formatted_data, indent=4, ensure_ascii=False)}")
                 else:
-                    logger.warning(f"⚠️ Nessun dato valido ricevuto per ASIN: {getattr(item, 'asin', 'Sconosciuto')}")
+                    logger.warning(f"⚠️ Nessun dato valido ricevuto per ASIN: {item.asin or 'Sconosciuto'}")
 
             return formatted_results
 
@@ -74,34 +69,41 @@ def get_product_data_from_api(asin_list):
 def get_special_offers():
     try:
         logger.info("🛠 Inviando richiesta API per offerte speciali...")
-        api = AmazonApi(AWS_ACCESS_KEY, AWS_SECRET_KEY, AWS_ASSOCIATE_TAG, AWS_REGION)
-        response = api.search_items(keywords="offerte Amazon", item_count=10)
+        items = run_sync(get_client().search_items("offerte Amazon", item_count=10))
 
-        if hasattr(response, "items"):
+        if items:
             logger.info("✅ Offerte trovate con successo!")
-            for item in response.items:
-                formatted_data = format_data(item)
-                asin = formatted_data["ASIN"]
+            offers = [format_data(item) for item in items]
 
-                # ✅ Recupero il link affiliato per l'ASIN
-                affiliate_link = get_affiliate_link(asin) if asin != "N/A" else "N/A"
-
-                save_product_data(
-                    asin=formatted_data["ASIN"],
-                    name=formatted_data["Titolo"],
-                    price=formatted_data["Prezzo"],
-                    old_price=None,
-                    discount=None,
-                    description="Offerta speciale Amazon",
-                    rating=formatted_data["Rating"],
-                    reviews=formatted_data["Recensioni"],
-                    availability=formatted_data["Stock"],
-                    image_url=formatted_data["Immagine"],
-                    affiliate_link=affiliate_link,
-                    category="Offerte",
-                    offer_text=formatted_data["offer_text"]
-                )
-                logger.info(f"✅ Offerta salvata per ASIN: {formatted_data['ASIN']}")
+            # ✅ DetailPageURL contiene già il tag affiliato: PA-API solo per gli ASIN senza URL
+            affiliate_links = resolve_many([offer["ASIN"] for offer in offers if offer["URL"] == "N/A"])
+
+            records = []
+            for formatted_data in offers:
+                asin = formatted_data["ASIN"]
+                if formatted_data["URL"] != "N/A":
+                    affiliate_link = formatted_data["URL"]
+                else:
+                    affiliate_link = affiliate_links.get(asin) if asin != "N/A" else "N/A"
+
+                records.append({
+                    "asin": formatted_data["ASIN"],
+                    "name": formatted_data["Titolo"],
+                    "price": formatted_data["Prezzo"],
+                    "old_price": formatted_data["Vecchio Prezzo"],
+                    "discount": formatted_data["Sconto"],
+                    "description": "Offerta speciale Amazon",
+                    "rating": formatted_data["Rating"],
+                    "reviews": formatted_data["Recensioni"],
+                    "availability": formatted_data["Stock"],
+                    "image_url": formatted_data["Immagine"],
+                    "affiliate_link": affiliate_link,
+                    "category": "Offerte",
+                    "offer_text": formatted_data["offer_text"]
+                })
+
+            saved = save_products_bulk(records)
+            logger.info(f"✅ Offerte salvate: {saved}/{len(records)}")
         else:
             logger.warning("⚠️ Nessuna offerta trovata.")
     except Exception as e:
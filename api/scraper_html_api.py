@@ -1,18 +1,13 @@
 import logging
-import time
-import random
-import re
 import os
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.keys import Keys
-from webdriver_manager.chrome import ChromeDriverManager
-from bs4 import BeautifulSoup
 from dotenv import load_dotenv
 from scraper_api import get_affiliate_link, get_special_offers  # ✅ Manteniamo entrambe le funzioni
-from database import check_product_exists, save_product_data
+from utils import resolve_many
+from affiliate_resolver import PAAPI_BATCH_SIZE
+from database import save_products_bulk, get_known_prices
+from known_asins import known_asins  # ✅ Prodotti noti vs nuovi senza una query per prodotto
+from http_fetcher import fetch_page  # ✅ HTTP prima, Selenium solo se serve
+from extractor import extract_product, search_results  # ✅ Estrazione lxml in un solo passaggio
 
 # ✅ Configurazione logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -22,180 +17,139 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 AWS_ASSOCIATE_TAG = os.getenv("AWS_ASSOCIATE_TAG")
 
-
-# ✅ Impostazioni WebDriver per Selenium
-def setup_driver():
-    options = Options()
-    options.add_argument("--disable-gpu")
-    options.add_argument("--no-sandbox")
-    options.add_argument("--disable-dev-shm-usage")
-    options.add_argument("--incognito")
-    options.add_argument("--window-size=1920,1080")
-    options.add_argument(
-        f"user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
-        f"(KHTML, like Gecko) Chrome/{random.randint(80, 115)}.0.{random.randint(4000, 5000)}.0 Safari/537.36"
-    )
-
-    service = Service(ChromeDriverManager().install())
-    driver = webdriver.Chrome(service=service, options=options)
-    return driver
-
-
-# ✅ Controlla se Amazon ha bloccato lo scraper
-def check_blocked(soup):
-    error_messages = [
-        "Enter the characters you see below",
-        "Sorry! Something went wrong!",
-        "Spiacenti, si è verificato un problema!"
-    ]
-    return any(msg in soup.text for msg in error_messages)
-
-
-# ✅ Accetta i cookie se presenti
-def accept_cookies(driver):
-    try:
-        time.sleep(2)
-        accept_button = driver.find_element(By.ID, "sp-cc-accept")
-        accept_button.click()
-        logger.info("✅ Banner cookie accettato.")
-    except Exception:
-        logger.info("⚠️ Nessun banner cookie trovato.")
-
-
-# ✅ Scroll della pagina per caricare più prodotti
-def scroll_page(driver):
+# 📌 Budget della paginazione
+SEARCH_MAX_PAGES = int(os.getenv("SEARCH_MAX_PAGES", 5))
+
+
+# ✅ Costruisce l'URL di una pagina prodotto o di una pagina di risultati
+def build_url(query, search_type="asin", page=1):
+    if search_type == "asin":
+        return f"https://www.amazon.it/dp/{query}"
+    url = f"https://www.amazon.it/s?k={query.replace(' ', '+')}"
+    if page > 1:
+        url += f"&page={page}"
+    return url
+
+
+# ✅ Generatore di risultati di ricerca: pagina dopo pagina, prodotto dopo prodotto
+def iter_search_results(query, max_pages=SEARCH_MAX_PAGES, max_items=None, start_page=1, stop_when_unchanged=True):
+    """
+    🔁 Percorre le pagine di risultati in modo pigro e restituisce ogni prodotto appena estratto.
+    - max_pages / max_items: budget di profondità e di prodotti
+    - stop_when_unchanged: si ferma se una pagina contiene solo ASIN già noti con prezzo invariato
+    """
+    yielded = 0
+    for page in range(start_page, start_page + max_pages):
+        doc, tier = fetch_page(build_url(query, "search", page), "search")
+        if doc is None:
+            logger.warning("⚠️ Amazon ha bloccato lo scraper! Riprova con un proxy o VPN.")
+            return
+        cards = search_results(doc)
+        logger.info(f"✅ Pagina {page} ({tier}): {len(cards)} prodotti trovati")
+        if not cards:
+            return
+
+        # Una sola query per pagina per sapere quali ASIN sono già noti e a che prezzo
+        known_prices = get_known_prices([card.get("data-asin") for card in cards if card.get("data-asin")])
+        page_unchanged = True
+
+        for card in cards:
+            try:
+                product_data = extract_product(card, query, "search")
+            except Exception as e:
+                logger.error(f"❌ Errore nell'estrazione prodotto: {e}")
+                continue
+
+            asin = product_data["asin"]
+            if asin not in known_prices or known_prices[asin] != product_data["price"]:
+                page_unchanged = False
+
+            yield product_data
+            yielded += 1
+            if max_items and yielded >= max_items:
+                return
+
+        if stop_when_unchanged and page_unchanged:
+            logger.info(f"⏹️ Pagina {page} senza novità: interrompo la paginazione per '{query}'.")
+            return
+
+
+# ✅ Recupera la pagina di un singolo prodotto come stream di un elemento
+def iter_product_page(asin):
+    doc, tier = fetch_page(build_url(asin, "asin"), "asin")
+    if doc is None:
+        logger.warning("⚠️ Amazon ha bloccato lo scraper! Riprova con un proxy o VPN.")
+        return
+    logger.info(f"🌐 Pagina ottenuta via {tier}")
     try:
-        body = driver.find_element(By.TAG_NAME, "body")
-        for _ in range(3):
-            body.send_keys(Keys.PAGE_DOWN)
-            time.sleep(random.uniform(1, 3))
-        logger.info("✅ Scroll della pagina completato.")
+        yield extract_product(doc, asin, "asin")
     except Exception as e:
-        logger.error(f"⚠️ Errore nello scroll: {e}")
-
-
-# ✅ Funzione per estrarre il testo in sicurezza
-def safe_get_text(tag, default="N/A"):
-    return tag.get_text(strip=True) if tag else default
-
-
-# ✅ Pulisce il prezzo e lo converte in float
-def clean_price(price_text):
-    if price_text and isinstance(price_text, str):
-        price_text = re.sub(r"[^\d,]", "", price_text).replace(",", ".")
-        try:
-            return float(price_text)
-        except ValueError:
-            return None
-    return None
-
+        logger.error(f"❌ Errore nell'estrazione prodotto: {e}")
 
-# ✅ Converte le recensioni in float
-def clean_rating(rating_text):
-    if rating_text and isinstance(rating_text, str):
-        rating_match = re.search(r"(\d+,\d+|\d+)", rating_text)
-        if rating_match:
-            return float(rating_match.group().replace(",", "."))
-    return None
 
+# ✅ Raggruppa uno stream in blocchi di dimensione fissa
+def _chunks(items, size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
 
-# ✅ Funzione principale per il web scraping HTML
-def get_product_data_from_html(query, search_type="asin"):
-    url = f"https://www.amazon.it/dp/{query}" if search_type == "asin" else f"https://www.amazon.it/s?k={query.replace(' ', '+')}"
-
-    driver = setup_driver()
-    driver.get(url)
-    accept_cookies(driver)
-    scroll_page(driver)
-    time.sleep(random.uniform(3, 6))
-
-    soup = BeautifulSoup(driver.page_source, "html.parser")
-    driver.quit()
-
-    if check_blocked(soup):
-        logger.warning("⚠️ Amazon ha bloccato lo scraper! Riprova con un proxy o VPN.")
-        return []
-
-    products = [soup] if search_type == "asin" else soup.select("div.s-main-slot div[data-component-type='s-search-result']")
-    logger.info(f"✅ Numero di prodotti trovati: {len(products)}")
 
-    scraped_data = []
+# ✅ Stadio di salvataggio: completa il link affiliato, salva e ripassa il prodotto a valle
+def save_products_stream(products):
+    # Blocchi da 10 prodotti: i link affiliati dei prodotti noti arrivano con una sola richiesta GetItems
+    for chunk in _chunks(products, PAAPI_BATCH_SIZE):
+        existing, _ = known_asins.split(p["asin"] for p in chunk)
+        if existing:
+            logger.info(f"🔄 Recupero link affiliati per {len(existing)} ASIN...")
+        affiliate_links = resolve_many(existing) if existing else {}
 
-    for product in products[:20]:
-        try:
-            asin = product.get("data-asin", query if search_type == "asin" else "N/A")
-
-            title = safe_get_text(product.select_one("h2 a span"))
-            if title == "N/A":
-                title = safe_get_text(product.select_one("span.a-size-medium.a-color-base"))
-            if title == "N/A":
-                title = safe_get_text(product.select_one("span.a-text-normal"))
-            if title == "N/A":
-                title = safe_get_text(product.select_one("div.s-title-instructions-style"))
-
-            price_raw = safe_get_text(product.select_one("span.a-price span.a-offscreen"))
-            price = clean_price(price_raw)
-            rating_raw = safe_get_text(product.select_one("span.a-icon-alt"))
-            rating = clean_rating(rating_raw)
-            reviews_raw = safe_get_text(product.select_one("span.a-size-base"))
-            reviews = int(re.sub(r"\D", "", reviews_raw)) if reviews_raw.isdigit() else None
-            image_url = product.select_one("img.s-image")["src"] if product.select_one("img.s-image") else "N/A"
-            description = safe_get_text(product.select_one("div.a-row.a-size-small"))
+        for product_data in chunk:
+            asin = product_data["asin"]
 
             # ✅ Recupero il link affiliato
-            if check_product_exists(asin):
-                logger.info(f"🔄 Recupero link affiliato per ASIN {asin}...")
-                affiliate_link = get_affiliate_link(asin)
+            if asin in affiliate_links:
+                product_data["affiliate_link"] = affiliate_links[asin]
             else:
-                affiliate_link = f"https://www.amazon.it/dp/{asin}?tag={AWS_ASSOCIATE_TAG}" if asin != "N/A" else "N/A"
-
-            # ✅ Salvataggio nel database con offerte speciali
-            product_data = {
-                "asin": asin,
-                "name": title,
-                "price": price,
-                "old_price": None,
-                "discount": None,
-                "description": description,
-                "rating": rating,
-                "reviews": reviews,
-                "availability": None,
-                "image_url": image_url,
-                "affiliate_link": affiliate_link,
-                "category": query,
-                "offer_text": None  # Questo sarà aggiornato con le offerte speciali
-            }
-
-            scraped_data.append(product_data)
-
-            save_product_data(
-                asin=asin,
-                name=title,
-                price=price,
-                old_price=None,
-                discount=None,
-                description=description,
-                rating=rating,
-                reviews=reviews,
-                availability=None,
-                image_url=image_url,
-                affiliate_link=affiliate_link,
-                category=query,
-                offer_text=None
-            )
-            logger.info(f"✅ Prodotto salvato nel database: {title}")
+                product_data["affiliate_link"] = f"https://www.amazon.it/dp/{asin}?tag={AWS_ASSOCIATE_TAG}" if asin != "N/A" else "N/A"
 
+        # ✅ Salvataggio nel database in blocco (COPY + un solo upsert per blocco)
+        try:
+            save_products_bulk(chunk)
         except Exception as e:
-            logger.error(f"❌ Errore nell'estrazione prodotto: {e}")
+            logger.error(f"❌ Errore nel salvataggio prodotti: {e}")
+            continue
+        yield from chunk
+
+
+# ✅ Funzione principale per il web scraping HTML
+def get_product_data_from_html(query, search_type="asin", page=1):
+    if search_type == "asin":
+        products = iter_product_page(query)
+    else:
+        products = iter_search_results(query, start_page=page)
+    return list(save_products_stream(products))
+
 
-    return scraped_data
+# ✅ Scraping di una categoria: pagine di risultati finché portano novità, salvate man mano
+def scrape_amazon_products(category, max_pages=SEARCH_MAX_PAGES):
+    """
+    🔁 Stream dei prodotti salvati per una categoria (usato dal crawler).
+    La paginazione è quella di iter_search_results: fino a max_pages pagine, con stop alla
+    prima pagina senza ASIN nuovi o prezzi cambiati. Nulla viene accumulato in memoria.
+    """
+    return save_products_stream(iter_search_results(category, max_pages=max_pages, stop_when_unchanged=True))
 
 
 # ✅ Funzione per ottenere dati (API + HTML Scraping)
 def get_complete_product_data(asin_or_keyword, search_type="asin"):
     try:
         if search_type == "asin":
-            if check_product_exists(asin_or_keyword):
+            if asin_or_keyword in known_asins:
                 logger.info(f"✅ Prodotto {asin_or_keyword} già nel database. Verifica aggiornamenti...")
                 return get_affiliate_link(asin_or_keyword)
 
@@ -1,9 +1,9 @@
 import os
 import logging
-import psycopg2
 import asyncio
 from dotenv import load_dotenv
 from telegram import Bot
+from db_pool import get_connection  # ✅ Pool di connessioni condiviso
 
 # Carica il file .env
 load_dotenv()
@@ -12,49 +12,26 @@ load_dotenv()
 TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
 TELEGRAM_CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
 
-# Configurazione Database
-DB_HOST = os.getenv("DB_HOST")
-DB_PORT = os.getenv("DB_PORT")
-DB_NAME = os.getenv("DB_NAME")
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-
 # Link Dashboard per Report
 DASHBOARD_LINK = "https://miodominio.com/dashboard"
 
 # Inizializza il bot
 bot = Bot(token=TELEGRAM_TOKEN)
 
-def connect_db():
-    """Connessione al database PostgreSQL."""
-    try:
-        conn = psycopg2.connect(
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            host=DB_HOST,
-            port=DB_PORT
-        )
-        return conn
-    except Exception as e:
-        logging.error(f"❌ Errore di connessione al database: {e}")
-        return None
-
 def count_discounted_offers():
     """Conta le offerte con sconto."""
-    conn = connect_db()
-    if not conn:
-        return 0
+    with get_connection() as conn:
+        if not conn:
+            return 0
 
-    try:
-        with conn.cursor() as cur:
-            cur.execute("SELECT COUNT(*) FROM product_prices WHERE discount > 0;")
-            count = cur.fetchone()[0]
-        conn.close()
-        return count
-    except Exception as e:
-        logging.error(f"❌ Errore nel conteggio offerte: {e}")
-        return 0
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT COUNT(*) FROM product_prices WHERE discount > 0;")
+                count = cur.fetchone()[0]
+            return count
+        except Exception as e:
+            logging.error(f"❌ Errore nel conteggio offerte: {e}")
+            return 0
 
 async def send_offers_notification():
     """Invia un messaggio con il link alle offerte."""
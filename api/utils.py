@@ -3,7 +3,9 @@ import time
 import re
 import os
 from dotenv import load_dotenv
-from amazon_paapi import AmazonApi
+from affiliate_resolver import AffiliateLinkResolver
+from affiliate_cache import AffiliateLinkCache
+from paapi_client import PaapiThrottled, get_client, run_sync  # ✅ Lo stesso client PA-API di scraper_api (quota inclusa)
 
 # Configurazione logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -14,13 +16,10 @@ load_dotenv()
 AWS_ACCESS_KEY = os.getenv("AWS_ACCESS_KEY")
 AWS_SECRET_KEY = os.getenv("AWS_SECRET_KEY")
 AWS_ASSOCIATE_TAG = os.getenv("AWS_ASSOCIATE_TAG")
-REGION = "IT"
 
-# Inizializza Amazon API
-if AWS_ACCESS_KEY and AWS_SECRET_KEY and AWS_ASSOCIATE_TAG:
-    amazon_api = AmazonApi(AWS_ACCESS_KEY, AWS_SECRET_KEY, AWS_ASSOCIATE_TAG, REGION)
-else:
-    amazon_api = None
+# Credenziali PA-API presenti?
+paapi_configured = bool(AWS_ACCESS_KEY and AWS_SECRET_KEY and AWS_ASSOCIATE_TAG)
+if not paapi_configured:
     logger.error("❌ Credenziali Amazon API non trovate. Verifica il file .env")
 
 
@@ -35,33 +34,61 @@ def clean_price(price_text):
     return None
 
 
-def get_affiliate_link(asin, max_retries=5, initial_wait=5):
-    """Recupera il link affiliato di un prodotto dato un ASIN con gestione delle richieste."""
-    if not amazon_api:
-        logger.warning("⚠️ Amazon API non inizializzata. Impossibile ottenere il link affiliato.")
-        return None
-
+def _get_items_batch(asins, max_retries=5, initial_wait=5):
+    """
+    Richiesta GetItems per un massimo di 10 ASIN, con gestione delle richieste. Ritorna {asin: link}:
+    gli ASIN assenti dalla risposta non hanno link. In caso di errore solleva un'eccezione,
+    così il risultato non viene memorizzato come negativo.
+    """
     retries = 0
     wait_time = initial_wait
     while retries < max_retries:
         try:
-            response = amazon_api.get_items(items=[asin])
-
-            if response and hasattr(response, "items") and isinstance(response.items, list) and len(response.items) > 0:
-                product = response.items[0]  # 🔹 Prendi il primo elemento della lista
-                return product.detail_page_url if hasattr(product, "detail_page_url") else None
-            else:
-                logger.warning(f"⚠️ Nessun link affiliato trovato per ASIN {asin}")
-                return None
-        except Exception as e:
-            if "TooManyRequests" in str(e):
-                logger.error(f"❌ Errore: Limite di richieste raggiunto per Amazon API. Riprovo in {wait_time} secondi...")
-                time.sleep(wait_time)
-                wait_time *= 2  # Exponential backoff
-                retries += 1
-            else:
-                logger.error(f"❌ Errore nel recupero del link affiliato: {e}")
-                return None
-
-    logger.error(f"❌ Impossibile ottenere il link affiliato per ASIN {asin} dopo {max_retries} tentativi.")
-    return None
+            # Il client condiviso prenota la quota PA-API e riusa le connessioni keep-alive
+            items = run_sync(get_client().get_items(asins))
+        except PaapiThrottled:
+            # Non dovrebbe accadere con il limiter: resta come rete di sicurezza
+            logger.error(f"❌ Errore: Limite di richieste raggiunto per Amazon API. Riprovo in {wait_time} secondi...")
+            time.sleep(wait_time)
+            wait_time *= 2  # Exponential backoff
+            retries += 1
+            continue
+
+        links = {item.asin: item.url for item in items if item.asin}
+        if not links:
+            logger.warning(f"⚠️ Nessun link affiliato trovato per ASIN {asins}")
+        return {asin: links.get(asin) for asin in asins}
+
+    raise RuntimeError(f"Impossibile ottenere il link affiliato per ASIN {asins} dopo {max_retries} tentativi.")
+
+
+# ✅ Un solo resolver per processo: raggruppa gli ASIN di tutti i chiamanti in batch da 10
+_resolver = AffiliateLinkResolver(_get_items_batch)
+
+# ✅ Cache davanti a ogni richiesta PA-API per i link affiliati
+affiliate_cache = AffiliateLinkCache()
+
+
+def get_affiliate_link(asin):
+    """Recupera il link affiliato di un prodotto dato un ASIN (cache, poi batch PA-API)."""
+    link = resolve_many([asin]).get(asin)
+    if not link:
+        logger.warning(f"⚠️ Nessun link affiliato trovato per ASIN {asin}")
+    return link
+
+
+def resolve_many(asins):
+    """Recupera i link affiliati di più ASIN con il minimo di richieste GetItems. Ritorna {asin: link}."""
+    asins = [asin for asin in asins if asin and asin != "N/A"]
+    links, missing = affiliate_cache.get_many(asins)
+    if not missing:
+        return links
+
+    if not paapi_configured:
+        logger.warning("⚠️ Amazon API non inizializzata. Impossibile ottenere i link affiliati.")
+        return links
+
+    fetched = _resolver.resolve_many(missing)
+    affiliate_cache.put_many(fetched)
+    links.update(fetched)
+    return links
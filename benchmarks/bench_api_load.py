@@ -0,0 +1,93 @@
+"""
+📊 Test di carico delle API prodotti/categorie: richieste/s e latenza p50/p99 per server.
+
+Confronta il server sincrono (Flask + psycopg2 su gunicorn) con quello asincrono
+(Quart + asyncpg su hypercorn), avviati sullo stesso database con lo stesso numero di worker:
+
+    RESPONSE_CACHE_ENABLED=0 gunicorn --chdir api -b 127.0.0.1:5001 -w 4 api:app
+    cd api && hypercorn -b 127.0.0.1:5002 -w 4 asgi_api:app
+
+La cache delle risposte va disattivata sul server sincrono, altrimenti si misura la cache e non il database.
+
+Uso:
+    python benchmarks/bench_api_load.py --target sync=http://127.0.0.1:5001 --target async=http://127.0.0.1:5002
+        [--concurrency 50] [--duration 20] [--warmup 3] [--paths /api/prodotti?limit=50 /api/categorie]
+"""
+import argparse
+import asyncio
+import time
+import aiohttp
+
+DEFAULT_PATHS = [
+    "/api/prodotti?limit=50",
+    "/api/prodotti?sort=-discount&limit=50",
+    "/api/prodotti?min_price=50&max_price=500&fields=asin,name,price",
+    "/api/cerca?q=laptop",
+    "/api/categorie",
+]
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, round(pct / 100 * len(values)) - 1))
+    return values[index]
+
+
+async def worker(session, base_url, paths, offset, deadline, latencies, errors):
+    i = offset
+    while time.perf_counter() < deadline:
+        url = base_url + paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            async with session.get(url) as response:
+                await response.read()
+                if response.status != 200:
+                    errors.append(response.status)
+                    continue
+        except Exception as e:
+            errors.append(type(e).__name__)
+            continue
+        latencies.append(time.perf_counter() - start)
+
+
+async def run_load(base_url, paths, concurrency, duration):
+    latencies, errors = [], []
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(
+            worker(session, base_url, paths, n, deadline, latencies, errors) for n in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - started
+    return latencies, errors, elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", action="append", required=True, help="nome=URL base del server")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--paths", nargs="+", default=DEFAULT_PATHS)
+    args = parser.parse_args()
+
+    targets = [t.split("=", 1) for t in args.target]
+    print(f"{'server':<10} {'richieste':>10} {'errori':>7} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9}")
+    for name, base_url in targets:
+        base_url = base_url.rstrip("/")
+        if args.warmup:
+            # Riempie i pool di connessioni prima della misura
+            await run_load(base_url, args.paths, args.concurrency, args.warmup)
+        latencies, errors, elapsed = await run_load(base_url, args.paths, args.concurrency, args.duration)
+        print(f"{name:<10} {len(latencies):>10} {len(errors):>7} {len(latencies) / elapsed:>10,.0f} "
+              f"{1000 * percentile(latencies, 50):>9.1f} {1000 * percentile(latencies, 99):>9.1f}")
+        if errors:
+            print(f"  ⚠️ errori ({name}): {sorted(set(map(str, errors)))}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
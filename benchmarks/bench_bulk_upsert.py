@@ -0,0 +1,135 @@
+"""
+📊 Benchmark salvataggio prodotti: INSERT ... ON CONFLICT riga per riga (il salvataggio storico,
+una transazione per prodotto) contro save_products_bulk (COPY + upsert).
+
+Richiede il database configurato nel file .env. Tutte le tabelle (product_prices, price_history,
+price_daily_stats, data_generation) vengono create in uno schema temporaneo "bench_<pid>",
+eliminato alla fine: i dati e il contatore di generazione reali non vengono toccati.
+
+Uso:
+    python benchmarks/bench_bulk_upsert.py [--sizes 1000 10000 100000] [--single-max 1000]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+BENCH_SCHEMA = f"bench_{os.getpid()}"
+# Ogni connessione del pool vede solo lo schema del benchmark: nessuna query può toccare public
+os.environ["PGOPTIONS"] = f"{os.environ.get('PGOPTIONS', '')} -c search_path={BENCH_SCHEMA}".strip()
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+from database import create_tables, save_products_bulk  # noqa: E402
+from db_pool import get_connection  # noqa: E402
+
+BENCH_CATEGORY = "Benchmark"
+
+# Il salvataggio storico di un prodotto: una riga, una transazione, nessuna impronta né price_history
+SINGLE_ROW_UPSERT = """
+    INSERT INTO product_prices (asin, name, price, old_price, discount, description, rating, reviews, availability, image_url, affiliate_link, category, offer_text, scraped_at)
+    VALUES (%(asin)s, %(name)s, %(price)s, %(old_price)s, %(discount)s, %(description)s, %(rating)s, %(reviews)s, %(availability)s, %(image_url)s, %(affiliate_link)s, %(category)s, %(offer_text)s, NOW())
+    ON CONFLICT (asin) DO UPDATE
+    SET name = EXCLUDED.name,
+        price = EXCLUDED.price,
+        old_price = CASE
+            WHEN product_prices.old_price IS NULL THEN product_prices.price
+            ELSE product_prices.old_price
+        END,
+        discount = EXCLUDED.discount,
+        description = EXCLUDED.description,
+        rating = EXCLUDED.rating,
+        reviews = EXCLUDED.reviews,
+        availability = EXCLUDED.availability,
+        image_url = EXCLUDED.image_url,
+        affiliate_link = EXCLUDED.affiliate_link,
+        category = EXCLUDED.category,
+        offer_text = EXCLUDED.offer_text,
+        scraped_at = NOW();
+"""
+
+
+def make_records(n, seed=0):
+    rng = random.Random(seed)
+    return [
+        {
+            "asin": f"BENCH{i:08d}",
+            "name": f"Prodotto di prova {i}",
+            "price": round(rng.uniform(5, 500), 2),
+            "old_price": None,
+            "discount": None,
+            "description": "Prodotto generato dal benchmark",
+            "rating": round(rng.uniform(1, 5), 1),
+            "reviews": rng.randint(0, 5000),
+            "availability": "Disponibile",
+            "image_url": f"https://example.com/{i}.jpg",
+            "affiliate_link": f"https://www.amazon.it/dp/BENCH{i:08d}?tag=bench",
+            "category": BENCH_CATEGORY,
+            "offer_text": None,
+        }
+        for i in range(n)
+    ]
+
+
+def run_sql(sql):
+    with get_connection() as conn:
+        if not conn:
+            raise RuntimeError("Database non raggiungibile: controlla il file .env")
+        with conn.cursor() as cur:
+            cur.execute(sql)
+        conn.commit()
+
+
+def save_single_rows(records):
+    """💾 Un INSERT ... ON CONFLICT e un commit per prodotto, come prima del salvataggio in blocco."""
+    for record in records:
+        with get_connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(SINGLE_ROW_UPSERT, record)
+            conn.commit()
+
+
+def cleanup():
+    # Svuota le tabelle dello schema del benchmark tra una misura e l'altra
+    run_sql("TRUNCATE product_prices, price_history, price_daily_stats;")
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--single-max", type=int, default=1000,
+                        help="Dimensione massima misurata anche riga per riga (lento)")
+    args = parser.parse_args()
+
+    run_sql(f"CREATE SCHEMA {BENCH_SCHEMA};")
+    create_tables()
+    print(f"Schema temporaneo: {BENCH_SCHEMA}")
+    print(f"{'righe':>8} {'metodo':<14} {'insert righe/s':>15} {'update righe/s':>15}")
+    try:
+        for size in args.sizes:
+            records = make_records(size)
+            # Secondo passaggio con prezzi diversi: misura il ramo ON CONFLICT DO UPDATE
+            updates = make_records(size, seed=1)
+
+            if size <= args.single_max:
+                cleanup()
+                insert = timed(lambda: save_single_rows(records))
+                update = timed(lambda: save_single_rows(updates))
+                print(f"{size:>8} {'riga per riga':<14} {size / insert:>15,.0f} {size / update:>15,.0f}")
+
+            cleanup()
+            insert = timed(lambda: save_products_bulk(records))
+            update = timed(lambda: save_products_bulk(updates))
+            print(f"{size:>8} {'bulk COPY':<14} {size / insert:>15,.0f} {size / update:>15,.0f}")
+    finally:
+        run_sql(f"DROP SCHEMA {BENCH_SCHEMA} CASCADE;")
+
+
+if __name__ == "__main__":
+    main()
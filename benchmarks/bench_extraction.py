@@ -0,0 +1,99 @@
+"""
+📊 Benchmark estrazione card Amazon: BeautifulSoup (html.parser + select_one) contro lxml (XPath precompilati).
+
+Uso:
+    python benchmarks/bench_extraction.py [cartella_fixture] [--runs N]
+    python benchmarks/bench_extraction.py --archive   # pagine reali dall'archivio (api/page_archive.py)
+"""
+import argparse
+import glob
+import os
+import re
+import sys
+import time
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+from extractor import parse_html, search_results, extract_product, clean_price, clean_rating  # noqa: E402
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+# ✅ Estrazione precedente, mantenuta qui solo come riferimento per il confronto
+def safe_get_text(tag, default="N/A"):
+    return tag.get_text(strip=True) if tag else default
+
+
+def legacy_extract(page_html, query):
+    soup = BeautifulSoup(page_html, "html.parser")
+    results = []
+    for product in soup.select("div.s-main-slot div[data-component-type='s-search-result']"):
+        title = safe_get_text(product.select_one("h2 a span"))
+        if title == "N/A":
+            title = safe_get_text(product.select_one("span.a-size-medium.a-color-base"))
+        if title == "N/A":
+            title = safe_get_text(product.select_one("span.a-text-normal"))
+        if title == "N/A":
+            title = safe_get_text(product.select_one("div.s-title-instructions-style"))
+        reviews_raw = safe_get_text(product.select_one("span.a-size-base"))
+        results.append({
+            "asin": product.get("data-asin", "N/A"),
+            "name": title,
+            "price": clean_price(safe_get_text(product.select_one("span.a-price span.a-offscreen"))),
+            "rating": clean_rating(safe_get_text(product.select_one("span.a-icon-alt"))),
+            "reviews": int(re.sub(r"\D", "", reviews_raw)) if reviews_raw.isdigit() else None,
+            "image_url": product.select_one("img.s-image")["src"] if product.select_one("img.s-image") else "N/A",
+            "description": safe_get_text(product.select_one("div.a-row.a-size-small")),
+        })
+    return results
+
+
+def lxml_extract(page_html, query):
+    doc = parse_html(page_html)
+    return [extract_product(card, query) for card in search_results(doc)]
+
+
+def timed(fn, pages, runs):
+    start = time.perf_counter()
+    for _ in range(runs):
+        for page_html in pages:
+            fn(page_html, "bench")
+    return (time.perf_counter() - start) / (runs * len(pages))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("fixtures", nargs="?", default=FIXTURES_DIR)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--archive", action="store_true", help="Usa le pagine di ricerca archiviate")
+    args = parser.parse_args()
+
+    if args.archive:
+        from page_archive import iter_archived_pages
+        pages = [page_html for _, _, search_type, page_html in iter_archived_pages() if search_type != "asin"]
+    else:
+        paths = sorted(glob.glob(os.path.join(args.fixtures, "*.html")))
+        pages = [open(p, encoding="utf-8").read() for p in paths]
+    if not pages:
+        sys.exit("❌ Nessuna pagina HTML trovata per il benchmark")
+
+    # ✅ Verifica che i due motori estraggano gli stessi dati
+    fields = ["asin", "name", "price", "rating", "reviews", "image_url", "description"]
+    mismatches = 0
+    for page_html in pages:
+        legacy = legacy_extract(page_html, "bench")
+        fast = [{k: p[k] for k in fields} for p in lxml_extract(page_html, "bench")]
+        mismatches += sum(1 for a, b in zip(legacy, fast) if a != b) + abs(len(legacy) - len(fast))
+    cards = sum(len(lxml_extract(p, "bench")) for p in pages)
+
+    legacy_s = timed(legacy_extract, pages, args.runs)
+    lxml_s = timed(lxml_extract, pages, args.runs)
+
+    print(f"📄 Pagine: {len(pages)} | Card: {cards} | Differenze: {mismatches}")
+    print(f"🐢 BeautifulSoup: {legacy_s * 1000:.2f} ms/pagina")
+    print(f"⚡ lxml + XPath:  {lxml_s * 1000:.2f} ms/pagina")
+    print(f"🚀 Speedup: {legacy_s / lxml_s:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
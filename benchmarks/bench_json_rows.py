@@ -0,0 +1,147 @@
+"""
+📊 Micro-benchmark degli elenchi prodotti: costruzione delle righe e serializzazione JSON.
+
+Confronta il percorso precedente (dizionario per riga + json della libreria standard, come jsonify
+di Flask con sort_keys) con quello attuale delle API (dizionario per riga + fast_json, cioè orjson se
+installato) e con una riga compatta (dataclass con slots) serializzata da orjson. La riga compatta
+occupa meno memoria ma orjson la serializza più lentamente di un dizionario: per questo le API
+restano sui dizionari e la variante è qui solo come termine di paragone.
+Ogni variante gira in un processo separato, così il picco di RSS è solo suo.
+Alla fine misura la compressione gzip/br del JSON prodotto.
+
+Non serve il database: le tuple sono sintetiche, come quelle restituite dal cursore.
+
+Uso:
+    python benchmarks/bench_json_rows.py [--rows 100000] [--repeat 3]
+"""
+import argparse
+import gzip
+import json
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import time
+from dataclasses import dataclass
+from itertools import starmap
+from typing import Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+import fast_json  # noqa: E402
+from product_queries import PRODUCT_FIELDS  # noqa: E402
+
+ROW_FIELDS = PRODUCT_FIELDS + ("offer_text",)
+
+
+@dataclass(slots=True)
+class CompactRow:
+    asin: str
+    name: Optional[str]
+    price: Optional[float]
+    old_price: Optional[float]
+    discount: Optional[float]
+    description: Optional[str]
+    rating: Optional[float]
+    reviews: Optional[int]
+    availability: Optional[str]
+    image_url: Optional[str]
+    affiliate_link: Optional[str]
+    category: Optional[str]
+    offer_text: Optional[str]
+
+
+def make_rows(n, seed=0):
+    rng = random.Random(seed)
+    return [
+        (
+            f"B{i:09d}", f"Prodotto di prova {i} con un nome abbastanza lungo", round(rng.uniform(5, 500), 2),
+            round(rng.uniform(500, 900), 2), round(rng.uniform(0, 60), 1), "Descrizione del prodotto " * 4,
+            round(rng.uniform(1, 5), 1), rng.randint(0, 5000), "Disponibile", f"https://example.com/{i}.jpg",
+            f"https://www.amazon.it/dp/B{i:09d}?tag=bench", rng.choice(["Laptop", "Smartphone", "Monitor"]), None,
+        )
+        for i in range(n)
+    ]
+
+
+def build_dicts(rows):
+    return [dict(zip(ROW_FIELDS, row)) for row in rows]
+
+
+def build_compact_rows(rows):
+    return list(starmap(CompactRow, rows))
+
+
+def dump_stdlib(items):
+    # Come DefaultJSONProvider di Flask: chiavi ordinate, ensure_ascii
+    return json.dumps(items, default=fast_json.json_default, sort_keys=True).encode("utf-8")
+
+
+VARIANTS = {
+    "dict + json": (build_dicts, dump_stdlib),
+    "dict + fast_json": (build_dicts, fast_json.dumps),
+}
+if fast_json.orjson is not None:
+    # Solo orjson serializza le dataclass: json_default non le converte
+    VARIANTS["slots + fast_json"] = (build_compact_rows, fast_json.dumps)
+
+
+def peak_rss_mb():
+    # ru_maxrss è in KB su Linux, in byte su macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_variant(name, n, repeat, queue):
+    build, dump = VARIANTS[name]
+    rows = make_rows(n)
+    base_rss = peak_rss_mb()
+    best_build = best_dump = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        items = build(rows)
+        built = time.perf_counter()
+        body = dump(items)
+        done = time.perf_counter()
+        best_build = min(best_build, built - start)
+        best_dump = min(best_dump, done - built)
+        del items, body
+    queue.put((name, best_build, best_dump, peak_rss_mb(), peak_rss_mb() - base_rss))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"orjson: {'sì' if fast_json.orjson else 'no'} - brotli: {'sì' if fast_json.brotli else 'no'} - "
+          f"{args.rows:,} righe")
+    print(f"{'variante':<24} {'righe µs':>9} {'JSON µs':>9} {'totale µs':>10} {'RSS picco MB':>13} {'RSS extra MB':>13}")
+    ctx = multiprocessing.get_context("spawn")
+    for name in VARIANTS:
+        queue = ctx.Queue()
+        process = ctx.Process(target=run_variant, args=(name, args.rows, args.repeat, queue))
+        process.start()
+        _, build, dump, peak, extra = queue.get()
+        process.join()
+        per_row = 1e6 / args.rows
+        print(f"{name:<24} {build * per_row:>9.2f} {dump * per_row:>9.2f} {(build + dump) * per_row:>10.2f} "
+              f"{peak:>13.1f} {extra:>13.1f}")
+
+    body = fast_json.dumps(build_dicts(make_rows(args.rows)))
+    print(f"\n{'compressione':<24} {'KB':>10} {'rapporto':>9} {'µs/riga':>9}")
+    print(f"{'nessuna':<24} {len(body) / 1024:>10,.0f} {1:>9.2f} {0:>9.2f}")
+    codecs = [("gzip", lambda b: gzip.compress(b, compresslevel=fast_json.JSON_GZIP_LEVEL, mtime=0))]
+    if fast_json.brotli:
+        codecs.append(("br", lambda b: fast_json.brotli.compress(b, quality=fast_json.JSON_BROTLI_QUALITY)))
+    for name, compress in codecs:
+        start = time.perf_counter()
+        compressed = compress(body)
+        elapsed = time.perf_counter() - start
+        print(f"{name:<24} {len(compressed) / 1024:>10,.0f} {len(body) / len(compressed):>9.2f} "
+              f"{elapsed * 1e6 / args.rows:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
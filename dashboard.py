@@ -1,7 +1,7 @@
 import streamlit as st 
 import pandas as pd
-import psycopg2
 import os
+import sys
 import hashlib
 import logging
 import plotly.express as px
@@ -12,12 +12,12 @@ from dotenv import load_dotenv
 # ✅ Carica variabili d'ambiente
 load_dotenv()
 
-# ✅ Configurazione Database PostgreSQL
-DB_NAME = os.getenv("DB_NAME")
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-DB_HOST = os.getenv("DB_HOST")
-DB_PORT = os.getenv("DB_PORT")
+# ✅ Connessioni al database dal pool condiviso con i moduli in api/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "api"))
+from db_pool import iter_batches
+
+# 📌 Giorni di storico prezzi mostrati nella dashboard
+DASHBOARD_HISTORY_DAYS = int(os.getenv("DASHBOARD_HISTORY_DAYS", 180))
 
 # ✅ Configurazione della pagina
 st.set_page_config(page_title="📊 AI-Powered Price Tracker", layout="wide")
@@ -26,46 +26,31 @@ st.set_page_config(page_title="📊 AI-Powered Price Tracker", layout="wide")
 st.sidebar.title("🔍 Navigazione")
 page = st.sidebar.radio("📌 Seleziona una sezione:", ["🏠 Home", "🛒 Offerte Attuali", "📈 Dashboard", "🤖 AI Previsioni"])
 
-# ✅ Funzione per connettersi al database
-def connect_db():
-    try:
-        conn = psycopg2.connect(
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            host=DB_HOST,
-            port=DB_PORT
-        )
-        return conn
-    except Exception as e:
-        logging.error(f"❌ Errore di connessione al database: {e}")
-        return None
-
 # ✅ Funzione per recuperare i dati prodotti
-def fetch_data():
-    conn = connect_db()
-    if not conn:
-        return pd.DataFrame()
+# Lo storico è letto a blocchi da un cursore lato server e solo per gli ultimi giorni
+# (le partizioni mensili più vecchie non vengono lette)
+def fetch_data(days=DASHBOARD_HISTORY_DAYS):
     try:
-        with conn.cursor() as cur:
-            cur.execute("""
+        frames = [
+            pd.DataFrame(rows, columns=columns)
+            for columns, rows in iter_batches("""
                 SELECT ph.asin, pp.name, ph.price, ph.old_price, ph.price_diff,
                        ph.rolling_avg_7, ph.rolling_avg_14, ph.rolling_avg_30, 
                        ph.rating, ph.reviews, pp.availability, pp.affiliate_link, ph.scraped_at
                 FROM price_history ph
                 JOIN product_prices pp ON ph.asin = pp.asin
+                WHERE ph.scraped_at >= NOW() - make_interval(days => %s)
                 ORDER BY ph.scraped_at DESC;
-            """)
-            columns = [desc[0] for desc in cur.description]
-            data = cur.fetchall()
-            df = pd.DataFrame(data, columns=columns)
-            df.fillna(0, inplace=True)
-            return df
+            """, (days,))
+        ]
+        if not frames:
+            return pd.DataFrame()
+        df = pd.concat(frames, ignore_index=True)
+        df.fillna(0, inplace=True)
+        return df
     except Exception as e:
         logging.error(f"❌ Errore nel recupero dati: {e}")
         return pd.DataFrame()
-    finally:
-        conn.close()
 
 # ✅ Sidebar - Accesso Premium
 license_key = st.sidebar.text_input("🔑 Inserisci la chiave di licenza", type="password")
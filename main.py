@@ -1,10 +1,22 @@
 import logging
-import time
-from api.scraper_api import get_special_offers, get_product_data_from_api
-from api.scraper_html_api import scrape_amazon_products
-from api.database import create_tables, get_all_products
-from api.notifications import send_bulk_emails
-from api.reports import generate_report
+import os
+import sys
+
+# I moduli in api/ si importano tra loro per nome (from http_fetcher import ...): main fa lo stesso,
+# così esiste un solo oggetto per modulo (cache, statistiche, pool, ASIN noti) invece di una copia api.*
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "api"))
+from scraper_api import get_special_offers, get_product_data_from_api
+from scraper_html_api import scrape_amazon_products, get_product_data_from_html
+from database import create_tables, count_products
+from notifications import send_bulk_emails
+from reports import generate_report
+from crawler import CrawlScheduler
+from freshness import run_freshness_cycle
+from rate_limit import get_paapi_limiter
+from http_fetcher import log_fetch_stats  # ✅ Stesso modulo usato dallo scraper
+from utils import affiliate_cache  # ✅ La cache usata da database e scraper_*
+from db_pool import pool_stats  # ✅ Il pool da cui prendono le connessioni tutti i moduli
+from known_asins import known_asins  # ✅ L'insieme interrogato da scraper_html_api e database
 
 # Configura il logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
@@ -22,21 +34,32 @@ def main():
 
     # ✅ Creazione delle tabelle nel database (se non esistono)
     create_tables()
+    known_asins.warm()  # ✅ ASIN noti in memoria: nessuna query di esistenza durante lo scraping
 
     # ✅ Step 1: Scraping API Amazon (recupero offerte speciali)
     logger.info("🛒 Recupero offerte speciali via API Amazon...")
     get_special_offers()
 
     # ✅ Step 2: Scraping HTML (recupero prodotti da categorie selezionate)
+    # Le categorie vengono elaborate in parallelo, ognuna pagina dopo pagina finché ci sono novità
+    # (SEARCH_MAX_PAGES al massimo); il token bucket per host evita i blocchi
     categorie = ["laptop", "tablet", "smartphone", "tv"]
+    crawler = CrawlScheduler(scrape_amazon_products)
     for categoria in categorie:
-        logger.info(f"🔎 Scraping categoria: {categoria}")
-        scrape_amazon_products(categoria)
-        time.sleep(2)  # Evita blocchi su Amazon
+        logger.info(f"🔎 Categoria in coda: {categoria}")
+        crawler.add_category(categoria)
+    crawler.run()
+
+    # ✅ Step 2b: Aggiornamento mirato dei prodotti noti, i più volatili per primi
+    logger.info("⏱️ Aggiornamento prodotti in scadenza...")
+    run_freshness_cycle(get_product_data_from_html)
+    log_fetch_stats()  # 📊 Hit rate e latenza per livello (HTTP / Selenium)
+    affiliate_cache.log_stats()  # 📊 Hit/miss della cache dei link affiliati
+    logger.info(f"📊 Quota PA-API: {get_paapi_limiter().usage()}")
+    logger.info(f"📊 Pool database: {pool_stats()}")
 
-    # ✅ Step 3: Recupero dati dal database per verificare i prodotti estratti
-    prodotti = get_all_products()
-    logger.info(f"📊 Numero totale di prodotti nel database: {len(prodotti)}")
+    # ✅ Step 3: Conteggio dei prodotti nel database per verificare quelli estratti
+    logger.info(f"📊 Numero totale di prodotti nel database: {count_products()}")
 
     # ✅ Step 4: Generazione report CSV con tutti i dati estratti
     report_path = generate_report()
@@ -1,79 +1,35 @@
-import pandas as pd
 import xlsxwriter
 import os
-import psycopg2
+import sys
 import logging
 from dotenv import load_dotenv
 
 # Carica variabili d'ambiente dal file .env
 load_dotenv()
 
-# Configurazione database PostgreSQL
-DB_NAME = os.getenv("DB_NAME")
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-DB_HOST = os.getenv("DB_HOST")
-DB_PORT = os.getenv("DB_PORT")
+# Connessioni al database dal pool condiviso con i moduli in api/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+from db_pool import iter_batches
 
 # Percorso file report
 REPORT_PATH = "data/analysis/report.xlsx"
 os.makedirs("data/analysis", exist_ok=True)  # Assicura che la cartella esista
 
-def connect_db():
-    """Connessione al database PostgreSQL."""
-    try:
-        conn = psycopg2.connect(
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            host=DB_HOST,
-            port=DB_PORT
-        )
-        return conn
-    except Exception as e:
-        logging.error(f"❌ Errore di connessione al database: {e}")
-        return None
-
-def fetch_data():
-    """Recupera i dati dal database PostgreSQL."""
-    conn = connect_db()
-    if not conn:
-        return pd.DataFrame()  # Ritorna un DataFrame vuoto se c'è un errore
-
-    try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT asin, name, price, old_price, discount, rating, reviews, availability, affiliate_link, scraped_at
-                FROM product_prices;
-            """)
-            columns = [desc[0] for desc in cur.description]
-            data = cur.fetchall()
-            return pd.DataFrame(data, columns=columns)
-    except Exception as e:
-        logging.error(f"❌ Errore nel recupero dati: {e}")
-        return pd.DataFrame()
-    finally:
-        conn.close()
+REPORT_QUERY = """
+    SELECT asin, name, price, old_price, discount, rating, reviews, availability, affiliate_link, scraped_at
+    FROM product_prices;
+"""
 
 def generate_report():
-    """Genera un report Excel leggendo i dati dal database."""
-    df = fetch_data()
-
-    # Controllo se ci sono dati
-    if df.empty:
-        logging.warning("⚠️ Nessun dato disponibile per generare il report.")
-        return
-
-    # Creazione file Excel
-    writer = pd.ExcelWriter(REPORT_PATH, engine='xlsxwriter')
-    df.to_excel(writer, sheet_name='Dati', index=False)
-
-    workbook = writer.book
-    worksheet = writer.sheets['Dati']
+    """Genera un report Excel leggendo i dati dal database a blocchi (memoria costante)."""
+    # constant_memory: xlsxwriter scrive ogni riga su disco appena completata
+    workbook = xlsxwriter.Workbook(REPORT_PATH, {'constant_memory': True, 'remove_timezone': True})
+    worksheet = workbook.add_worksheet('Dati')
 
     # Formattazione colonne
     currency_format = workbook.add_format({'num_format': '€#,##0.00'})
     bold_format = workbook.add_format({'bold': True})
+    date_format = workbook.add_format({'num_format': 'yyyy-mm-dd hh:mm'})
 
     worksheet.set_column('C:C', 12, currency_format)  # Colonna prezzo
     worksheet.set_column('D:D', 12, currency_format)  # Colonna prezzo originale
@@ -81,21 +37,37 @@ def generate_report():
     worksheet.set_column('F:F', 10)
     worksheet.set_column('G:G', 10)
     worksheet.set_column('H:H', 20)
+    worksheet.set_column('J:J', 18, date_format)
+
+    row_count = 0
+    for columns, rows in iter_batches(REPORT_QUERY):
+        if row_count == 0:
+            worksheet.write_row(0, 0, columns, bold_format)
+        for row in rows:
+            row_count += 1
+            worksheet.write_row(row_count, 0, row)
+
+    # Controllo se ci sono dati
+    if row_count == 0:
+        workbook.close()
+        os.remove(REPORT_PATH)
+        logging.warning("⚠️ Nessun dato disponibile per generare il report.")
+        return
 
     # Aggiunta statistiche chiave
-    row_count = len(df) + 1  # +1 per tenere conto dell'intestazione
-    worksheet.write(row_count, 0, "Statistiche Chiave", bold_format)
-    worksheet.write(row_count + 1, 0, "Prezzo Medio (€)", bold_format)
-    worksheet.write(row_count + 1, 1, f"=AVERAGE(C2:C{row_count})", currency_format)
-    worksheet.write(row_count + 2, 0, "Numero Prodotti", bold_format)
-    worksheet.write(row_count + 2, 1, f"=COUNTA(A2:A{row_count})")
+    stats_row = row_count + 1  # riga dopo l'ultimo prodotto
+    worksheet.write(stats_row, 0, "Statistiche Chiave", bold_format)
+    worksheet.write(stats_row + 1, 0, "Prezzo Medio (€)", bold_format)
+    worksheet.write(stats_row + 1, 1, f"=AVERAGE(C2:C{stats_row})", currency_format)
+    worksheet.write(stats_row + 2, 0, "Numero Prodotti", bold_format)
+    worksheet.write(stats_row + 2, 1, f"=COUNTA(A2:A{stats_row})")
 
     # Creazione grafico prezzi avanzato
     chart = workbook.add_chart({'type': 'line'})
     chart.add_series({
         'name': 'Prezzo',
-        'categories': f'Dati!$B$2:$B${len(df)+1}',
-        'values': f'Dati!$C$2:$C${len(df)+1}',
+        'categories': f'Dati!$B$2:$B${row_count+1}',
+        'values': f'Dati!$C$2:$C${row_count+1}',
         'line': {'color': 'blue'}
     })
     chart.set_title({'name': 'Andamento Prezzi'})
@@ -104,7 +76,7 @@ def generate_report():
     worksheet.insert_chart(f'P2', chart)  # Posizione grafico
 
     # Salva il file Excel
-    writer.close()
+    workbook.close()
     logging.info(f"✅ Report Excel generato in {REPORT_PATH}")
 
 if __name__ == "__main__":
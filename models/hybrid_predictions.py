@@ -1,6 +1,7 @@
 import pandas as pd
 import numpy as np
 import os
+import sys
 import joblib
 import tensorflow as tf
 import matplotlib.pyplot as plt
@@ -10,6 +11,10 @@ from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import mean_squared_error, mean_absolute_error, r2_score
 from datetime import datetime
 
+# ✅ Stessa ricerca per prefisso di /api/cerca (product_queries.py in api/)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+from product_queries import prefix_tsquery
+
 # ✅ Carica le variabili d'ambiente
 load_dotenv()
 DB_NAME = os.getenv("DB_NAME")
@@ -32,14 +37,15 @@ category = get_category()
 query = """
     SELECT price_history.asin, price_history.scraped_at, price_history.old_price, price_history.price_diff, 
            price_history.rolling_avg_7, price_history.rolling_avg_14, price_history.rolling_avg_30, 
+           price_history.rolling_avg_60, price_history.rolling_avg_90, 
            price_history.rating, price_history.reviews
     FROM price_history
     JOIN product_prices ON price_history.asin = product_prices.asin
-    WHERE LOWER(product_prices.name) LIKE %s
+    WHERE product_prices.search_vector @@ to_tsquery('simple', %s)  -- indice GIN su nome e categoria
     ORDER BY price_history.scraped_at
 """
 
-df = pd.read_sql(query, engine, params=(f"%{category}%",))
+df = pd.read_sql(query, engine, params=(prefix_tsquery(category, every_word=True),))
 
 if df.empty:
     raise ValueError("❌ Errore: Nessun dato disponibile per questa categoria!")
@@ -1,6 +1,7 @@
 import pandas as pd
 import numpy as np
 import os
+import sys
 import logging
 import optuna
 import joblib
@@ -10,6 +11,10 @@ from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler, MinMaxScaler
 import xgboost as xgb
 
+# ✅ Stessa ricerca per prefisso di /api/cerca (product_queries.py in api/)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "api"))
+from product_queries import prefix_tsquery
+
 # ✅ Carica variabili d'ambiente
 load_dotenv()
 
@@ -34,15 +39,16 @@ category = get_category()
 query = """
     SELECT price_history.asin, price_history.price, price_history.old_price, price_history.price_diff, 
            price_history.rolling_avg_7, price_history.rolling_avg_14, price_history.rolling_avg_30, 
+           price_history.rolling_avg_60, price_history.rolling_avg_90, 
            price_history.rating, price_history.reviews, price_history.scraped_at
     FROM price_history
     JOIN product_prices ON price_history.asin = product_prices.asin
-    WHERE LOWER(product_prices.name) LIKE %s
+    WHERE product_prices.search_vector @@ to_tsquery('simple', %s)  -- indice GIN su nome e categoria
     ORDER BY price_history.scraped_at;
 """
 
 try:
-    df = pd.read_sql(query, engine, params=(f"%{category}%",))
+    df = pd.read_sql(query, engine, params=(prefix_tsquery(category, every_word=True),))
     if df.empty:
         raise ValueError(f"⚠️ Nessun dato trovato per la categoria '{category}'.")
 except Exception as e:
@@ -58,10 +64,7 @@ if "scraped_at" in df.columns:
     df["scraped_at"] = pd.to_datetime(df["scraped_at"])
     df["days_since"] = (df["scraped_at"].max() - df["scraped_at"]).dt.days
 
-# ✅ Feature Engineering
-df["rolling_avg_60"] = df["price"].rolling(window=60, min_periods=1).mean()
-df["rolling_avg_90"] = df["price"].rolling(window=90, min_periods=1).mean()
-
+# ✅ Feature già calcolate per ASIN al momento dell'inserimento (api/price_history.py)
 selected_features = ["days_since", "old_price", "price_diff", "rolling_avg_7", "rolling_avg_14", "rolling_avg_30", "rolling_avg_60", "rolling_avg_90", "rating", "reviews"]
 X = df[selected_features]
 y = df["price"]
@@ -1,2 +1,7 @@
 #!/bin/bash
-gunicorn -b 0.0.0.0:5001 main:app
+# API_MODE=async -> Quart + asyncpg (api/asgi_api.py) su hypercorn; altrimenti Flask + psycopg2 (api/api.py) su gunicorn
+if [ "$API_MODE" = "async" ]; then
+    cd api && exec hypercorn -b 0.0.0.0:5001 -w "${WEB_CONCURRENCY:-1}" asgi_api:app
+else
+    exec gunicorn --chdir api -b 0.0.0.0:5001 api:app
+fi
@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from conftest import read_fixture
+from extractor import extract_product, parse_html
+
+ASIN = "B0TEST0001"
+
+
+def test_product_page_uses_product_selectors():
+    product = extract_product(parse_html(read_fixture("product_page_dp.html")), ASIN, "asin")
+
+    assert product["asin"] == ASIN
+    assert product["name"] == 'Portatile di prova 15,6" 16GB RAM'
+    assert product["price"] == 599.99
+    assert product["rating"] == 4.5
+    assert product["reviews"] == 1234
+    assert product["image_url"] == "https://m.media-amazon.com/images/I/portatile._AC_SX679_.jpg"
+    assert product["description"] == "Processore di ultima generazione | 16 GB di RAM e SSD da 512 GB"
+    # La categoria non è nella pagina: resta quella salvata
+    assert product["category"] is None
+
+
+def test_freshness_cycle_saves_product_page_fields(monkeypatch):
+    pytest.importorskip("psycopg2")
+    pytest.importorskip("selenium")
+    import freshness
+    import scraper_html_api
+
+    saved = []
+    monkeypatch.setattr(freshness, "refresh_schedule", lambda: 0)
+    monkeypatch.setattr(freshness, "get_due_products",
+                        lambda limit: [(ASIN, 0.5, 24.0, datetime.now() - timedelta(hours=1))])
+    monkeypatch.setattr(freshness, "mark_checked", lambda asin, interval_hours: None)
+    monkeypatch.setattr(scraper_html_api, "fetch_page",
+                        lambda url, search_type: (parse_html(read_fixture("product_page_dp.html")), "http"))
+    monkeypatch.setattr(scraper_html_api.known_asins, "split", lambda asins: ([], list(asins)))
+    monkeypatch.setattr(scraper_html_api, "save_products_bulk", lambda records: saved.extend(records))
+
+    assert freshness.run_freshness_cycle(scraper_html_api.get_product_data_from_html, budget=1) == 1
+
+    [record] = saved
+    assert record["asin"] == ASIN
+    assert record["name"] == 'Portatile di prova 15,6" 16GB RAM'
+    assert record["image_url"].endswith("portatile._AC_SX679_.jpg")
+    assert record["description"] != "N/A"
+    assert record["price"] == 599.99
+
+
+def test_missing_fields_keep_stored_values():
+    pytest.importorskip("psycopg2")
+    from database import _fill_missing
+
+    stored = {"category": "laptop", "availability": "Disponibile", "name": "Portatile",
+              "description": "Descrizione salvata", "image_url": "https://example.com/p.jpg"}
+    record = {"asin": ASIN, "name": "Portatile nuovo", "description": "N/A", "image_url": "N/A",
+              "category": None, "availability": None}
+
+    filled = _fill_missing(record, stored)
+
+    assert filled["name"] == "Portatile nuovo"
+    assert filled["description"] == "Descrizione salvata"
+    assert filled["image_url"] == "https://example.com/p.jpg"
+    assert filled["category"] == "laptop"
+    assert filled["availability"] == "Disponibile"
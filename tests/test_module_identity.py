@@ -0,0 +1,21 @@
+import pytest
+
+
+def test_main_shares_module_state_with_the_scraper():
+    # main importa i moduli di api/ per nome come fanno loro tra loro: un solo oggetto per modulo
+    for dependency in ("psycopg2", "selenium", "pandas"):
+        pytest.importorskip(dependency)
+    import main
+    import database
+    import db_pool
+    import http_fetcher
+    import known_asins
+    import scraper_html_api
+    import utils
+
+    assert main.known_asins is known_asins.known_asins
+    assert scraper_html_api.known_asins is known_asins.known_asins
+    assert database.known_asins is known_asins.known_asins
+    assert main.affiliate_cache is utils.affiliate_cache
+    assert main.log_fetch_stats is http_fetcher.log_fetch_stats
+    assert main.pool_stats is db_pool.pool_stats
@@ -0,0 +1,97 @@
+import asyncio
+import json
+from datetime import datetime, timezone
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from paapi_client import PaapiClient, PaapiError, PaapiThrottled, sign_request
+
+ACCESS_KEY = "AKIDTEST"
+SECRET_KEY = "segreto-di-prova"
+HOST = "webservices.amazon.it"
+REGION = "eu-west-1"
+
+
+class NoWaitLimiter:
+    """Quota sempre disponibile: il test non aspetta il limiter condiviso."""
+
+    def __init__(self):
+        self.reserved = 0
+
+    def reserve(self):
+        self.reserved += 1
+        return 0.0
+
+
+def _item(asin):
+    return {"ASIN": asin, "DetailPageURL": f"https://www.amazon.it/dp/{asin}?tag=test-21",
+            "ItemInfo": {"Title": {"DisplayValue": f"Prodotto {asin}"}}}
+
+
+def run_against_stub(handler, scenario):
+    """Avvia un server PA-API finto su 127.0.0.1 e esegue scenario(client) contro di esso."""
+    async def main():
+        app = web.Application()
+        app.router.add_post("/paapi5/{operation}", handler)
+        server = TestServer(app, host="127.0.0.1")
+        await server.start_server()
+        client = PaapiClient(access_key=ACCESS_KEY, secret_key=SECRET_KEY, partner_tag="test-21", host=HOST,
+                             region=REGION, base_url=f"http://127.0.0.1:{server.port}", limiter=NoWaitLimiter())
+        try:
+            return await scenario(client)
+        finally:
+            await client.close()
+            await server.close()
+
+    return asyncio.run(main())
+
+
+def test_get_items_signs_requests_and_sends_batches_of_ten():
+    requests = []
+
+    async def handler(request):
+        payload = await request.text()
+        requests.append((request.path, request.headers.copy(), json.loads(payload), payload))
+        return web.json_response({"ItemsResult": {"Items": [_item(a) for a in json.loads(payload)["ItemIds"]]}})
+
+    asins = [f"B0TEST{i:04d}" for i in range(25)]
+    items = run_against_stub(handler, lambda client: client.get_items(asins))
+
+    assert [item.asin for item in items] == asins
+    assert items[0].url == f"https://www.amazon.it/dp/{asins[0]}?tag=test-21"
+    assert [len(body["ItemIds"]) for _, _, body, _ in requests] == [10, 10, 5]
+
+    for path, headers, body, payload in requests:
+        assert path == "/paapi5/getitems"
+        assert body["PartnerTag"] == "test-21"
+        assert headers["X-Amz-Target"] == "com.amazon.paapi5.v1.ProductAdvertisingAPIv1.GetItems"
+        # La firma ricalcolata con la stessa data deve coincidere con quella ricevuta
+        now = datetime.strptime(headers["X-Amz-Date"], "%Y%m%dT%H%M%SZ").replace(tzinfo=timezone.utc)
+        expected = sign_request(ACCESS_KEY, SECRET_KEY, HOST, REGION, path, headers["X-Amz-Target"], payload, now=now)
+        assert headers["Authorization"] == expected["authorization"]
+        assert headers["Authorization"].startswith(f"AWS4-HMAC-SHA256 Credential={ACCESS_KEY}/")
+        assert headers["Host"] == HOST
+
+
+@pytest.mark.parametrize("response", [
+    lambda: web.json_response({"Errors": [{"Code": "TooManyRequests", "Message": "Rallenta"}]}, status=429),
+    lambda: web.Response(text="<html>Too Many Requests</html>", status=429, content_type="text/html"),
+])
+def test_429_raises_throttled(response):
+    async def handler(request):
+        return response()
+
+    with pytest.raises(PaapiThrottled):
+        run_against_stub(handler, lambda client: client.get_items(["B0TEST0001"]))
+
+
+def test_non_json_error_body_raises_paapi_error():
+    async def handler(request):
+        return web.Response(text="<html>Bad Gateway</html>", status=502, content_type="text/html")
+
+    with pytest.raises(PaapiError) as excinfo:
+        run_against_stub(handler, lambda client: client.get_items(["B0TEST0001"]))
+    assert excinfo.value.status == 502
+    assert not isinstance(excinfo.value, PaapiThrottled)
@@ -0,0 +1,13 @@
+from product_queries import prefix_tsquery, product_filters
+
+
+def test_availability_filter_escapes_like_wildcards():
+    conditions, params = product_filters(availability="100%_ok\\")
+    assert conditions == ["availability ILIKE %s"]
+    assert params == ["%100\\%\\_ok\\\\%"]
+
+
+def test_prefix_tsquery():
+    assert prefix_tsquery("Laptop Gaming") == "laptop & gaming:*"
+    assert prefix_tsquery("Laptop Gaming", every_word=True) == "laptop:* & gaming:*"
+    assert prefix_tsquery(" - ") is None